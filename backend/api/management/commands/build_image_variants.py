@@ -0,0 +1,60 @@
+"""WebP-варианты для изображений, загруженных до их появления"""
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from api.services import images
+from api.services.cache_manager import get_cache_manager
+from recipes.models import Recipe
+from users.models import CustomUser
+
+# Модель, поле и пространства кэша с ответами, где есть изображение
+TARGETS = (
+    (Recipe, 'image', ('recipes', 'recipe:{pk}')),
+    (CustomUser, 'avatar', ('users', 'recipes')),
+)
+
+
+class Command(BaseCommand):
+    help = ('Построить варианты изображений рецептов и аватаров, '
+            'у которых их ещё нет')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true',
+                            help='Строить в этом процессе, без Celery')
+
+    def handle(self, *args, **options):
+        built = set()
+        for model, field, namespaces in TARGETS:
+            vfield = images.variants_field(field)
+            pending = (
+                model.objects
+                .exclude(**{field: ''})
+                .exclude(**{f'{field}__isnull': True})
+                .filter(**{vfield: {}})
+                .values_list('pk', flat=True)
+                .iterator()
+            )
+            count = 0
+            for pk in pending:
+                object_namespaces = [ns.format(pk=pk) for ns in namespaces]
+                if not options['sync']:
+                    images.schedule_variants(model(pk=pk), field,
+                                             object_namespaces)
+                else:
+                    try:
+                        if not images.make_variants(model, pk, field):
+                            continue
+                    except UnidentifiedImageError as e:
+                        self.stderr.write(
+                            f'{model._meta.label} #{pk}: {e}'
+                        )
+                        continue
+                    built.update(object_namespaces)
+                count += 1
+            self.stdout.write(f'{model._meta.label}.{field}: {count}')
+
+        # Без Celery кэш сбрасывается один раз за весь проход
+        if built:
+            cache = get_cache_manager()
+            if cache:
+                cache.bump_generations(*sorted(built))
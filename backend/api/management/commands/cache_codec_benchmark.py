@@ -0,0 +1,99 @@
+"""Сравнение кодеков кэша на реальных ответах RecipeListSerializer"""
+import time
+from itertools import product
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from api.serializers.recipes import RecipeListSerializer
+from api.services.cache_manager import CacheCodec
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Размер и время кодирования/декодирования страниц списка '
+            'рецептов для каждого кодека кэша')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--page-size', type=int,
+                            default=settings.REST_FRAMEWORK['PAGE_SIZE'])
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--compress-min-bytes', type=int, default=1024)
+
+    def handle(self, *args, **options):
+        payloads = self._build_payloads(options['pages'],
+                                        options['page_size'])
+        if not payloads:
+            self.stderr.write('Нет рецептов для замера.')
+            return
+
+        self.stdout.write(
+            f"Страниц: {len(payloads)}, рецептов на странице: "
+            f"{options['page_size']}, повторов: {options['repeat']}\n"
+        )
+        self.stdout.write(
+            f"{'codec':<16}{'avg bytes':>12}{'ratio':>8}"
+            f"{'encode, us':>12}{'decode, us':>12}"
+        )
+
+        baseline = None
+        for fmt, compression in product(CacheCodec.FORMATS,
+                                        CacheCodec.COMPRESSIONS):
+            codec = CacheCodec(fmt, compression,
+                               options['compress_min_bytes'])
+            if codec.name != f"{fmt}+{compression}":
+                continue
+            size, encode_us, decode_us = self._measure(
+                codec, payloads, options['repeat']
+            )
+            baseline = baseline or size
+            self.stdout.write(
+                f"{codec.name:<16}{size:>12.0f}{size / baseline:>8.2f}"
+                f"{encode_us:>12.1f}{decode_us:>12.1f}"
+            )
+
+    def _build_payloads(self, pages, page_size):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = AnonymousUser()
+        context = {'request': request}
+
+        recipes = list(
+            Recipe.objects
+            .select_related('author')
+            .prefetch_related('ingredient_amounts__ingredient')
+            [:pages * page_size]
+        )
+        payloads = []
+        for start in range(0, len(recipes), page_size):
+            page = recipes[start:start + page_size]
+            payloads.append({
+                'count': len(recipes),
+                'next': None,
+                'previous': None,
+                'results': RecipeListSerializer(
+                    page, many=True, context=context
+                ).data,
+            })
+        return payloads
+
+    def _measure(self, codec, payloads, repeat):
+        encoded = [codec.encode(payload) for payload in payloads]
+        size = sum(map(len, encoded)) / len(encoded)
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for payload in payloads:
+                codec.encode(payload)
+        encode_us = ((time.perf_counter() - started)
+                     / (repeat * len(payloads)) * 1e6)
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for data in encoded:
+                codec.decode(data)
+        decode_us = ((time.perf_counter() - started)
+                     / (repeat * len(payloads)) * 1e6)
+        return size, encode_us, decode_us
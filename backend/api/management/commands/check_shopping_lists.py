@@ -0,0 +1,23 @@
+"""Сверка списков покупок (ShoppingListItem) с корзинами"""
+from django.core.management.base import BaseCommand
+
+from api.services import shopping_list
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать списки покупок, разошедшиеся с корзинами '
+            '(то же делает периодическая задача Celery)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=shopping_list.CHECK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        drifted = shopping_list.check(options['batch_size'])
+        if drifted:
+            self.stdout.write(
+                f"Исправлено списков: {len(drifted)} "
+                f"(user_id: {', '.join(map(str, drifted))})"
+            )
+        else:
+            self.stdout.write('Расхождений нет.')
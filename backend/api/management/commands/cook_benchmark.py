@@ -0,0 +1,98 @@
+"""Подбор рецептов по ингредиентам: инвертированный индекс против SQL"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db.models import Count
+from rest_framework.settings import api_settings
+
+from api.services import recipe_index
+from api.views.filters import RecipeFilter
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Время подбора рецептов по набору ингредиентов: индекс '
+            'в памяти, первая страница ?have= как в API и GROUP BY/HAVING '
+            'в БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--have', type=int, default=15,
+                            help='Ингредиентов в одном наборе')
+        parser.add_argument('--sets', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--min-coverage', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Наборы из используемых ингредиентов, иначе совпадений не будет
+        used = list(
+            Ingredient.objects
+            .annotate(usage=Count('used_in'))
+            .filter(usage__gt=0)
+            .values_list('id', flat=True)
+        )
+        if not used:
+            self.stderr.write('Нет рецептов с ингредиентами для замера.')
+            return
+
+        rng = random.Random(options['seed'])
+        sets = [rng.sample(used, min(options['have'], len(used)))
+                for _ in range(options['sets'])]
+        min_coverage = options['min_coverage']
+
+        started = time.perf_counter()
+        index = recipe_index.RecipeIngredientIndex(
+            recipe_index._load_pairs()
+        )
+        build_ms = (time.perf_counter() - started) * 1e3
+        self.stdout.write(
+            f"Рецептов в индексе: {len(index)}, сборка: {build_ms:.1f} ms\n"
+            f"Наборов: {len(sets)} по {options['have']} ингредиентов, "
+            f"min_coverage={min_coverage}, повторов: {options['repeat']}\n"
+        )
+
+        for ingredient_ids in sets:
+            expected = recipe_index.naive_coverage(ingredient_ids,
+                                                   min_coverage)
+            actual = index.coverage(ingredient_ids, min_coverage)
+            if ([row[0] for row in expected]
+                    != [row[0] for row in actual]):
+                self.stderr.write(f'Результаты расходятся: {ingredient_ids}')
+                return
+
+        def endpoint(ingredient_ids):
+            # Как GET /api/recipes/?have=...: фильтр, COUNT и страница
+            filterset = RecipeFilter(data={
+                'have': ','.join(map(str, ingredient_ids)),
+                'min_coverage': min_coverage,
+            }, queryset=Recipe.objects.select_related('author'))
+            page = Paginator(filterset.qs, api_settings.PAGE_SIZE).page(1)
+            return [recipe.pk for recipe in page]
+
+        for ingredient_ids in sets:
+            expected = index.coverage(ingredient_ids, min_coverage,
+                                      limit=api_settings.PAGE_SIZE)
+            if endpoint(ingredient_ids) != [row[0] for row in expected]:
+                self.stderr.write(f'Страница расходится: {ingredient_ids}')
+                return
+
+        timings = {
+            'index': lambda ids: index.coverage(ids, min_coverage),
+            'endpoint': endpoint,
+            'sql': lambda ids: recipe_index.naive_coverage(ids,
+                                                           min_coverage),
+        }
+        self.stdout.write(f"{'method':<10}{'avg, ms':>10}{'p95, ms':>10}")
+        for method, run in timings.items():
+            samples = []
+            for _ in range(options['repeat']):
+                for ingredient_ids in sets:
+                    started = time.perf_counter()
+                    run(ingredient_ids)
+                    samples.append((time.perf_counter() - started) * 1e3)
+            samples.sort()
+            avg = sum(samples) / len(samples)
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            self.stdout.write(f"{method:<10}{avg:>10.3f}{p95:>10.3f}")
@@ -0,0 +1,21 @@
+"""Сверка денормализованных счётчиков с исходными таблицами"""
+from django.core.management.base import BaseCommand
+
+from api.services import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитать счётчики избранного, корзин, рецептов '
+            'и подписчиков, разошедшиеся с данными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile(dry_run=options['dry_run'])
+        verb = 'Расходится' if options['dry_run'] else 'Исправлено'
+        for label, count in fixed.items():
+            self.stdout.write(f'{label}: {verb.lower()} строк - {count}')
+        if not any(fixed.values()):
+            self.stdout.write('Расхождений нет.')
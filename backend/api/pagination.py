@@ -1,5 +1,93 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipeFeedPagination(LimitPageNumberPagination):
+    """
+    page/limit по умолчанию; с параметром cursor (пустой - первая
+    страница) - keyset по (created_at, id) без COUNT и OFFSET.
+
+    Курсор идёт по дате, поэтому с упорядоченными по релевантности
+    search и have не сочетается - для них только page.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    ranked_query_params = ('search', 'have')
+    invalid_cursor_message = 'Неверный курсор.'
+    ranked_cursor_message = ('Курсор нельзя сочетать с search и have, '
+                             'используйте page.')
+
+    cursor_mode = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        if any(request.query_params.get(name)
+               for name in self.ranked_query_params):
+            raise ValidationError(
+                {self.cursor_query_param: [self.ranked_cursor_message]}
+            )
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, pk__lt=pk)
+            )
+
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(last.created_at, last.pk),
+        )
+
+    @staticmethod
+    def encode_cursor(created_at: datetime, pk: int) -> str:
+        raw = f'{created_at.isoformat()}|{pk}'.encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            created_at, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, FileUploadParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    JSON-объекты по одному на строку.
+
+    Разбирается лениво: request.data - генератор, тело не читается
+    в память целиком. Строка с некорректным JSON отдаётся как
+    ParseError, чтобы ошибка попала в результат своего элемента,
+    а не оборвала весь поток.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return self._iter_lines(stream, encoding)
+
+    @staticmethod
+    def _iter_lines(stream, encoding):
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(encoding))
+            except ValueError as exc:
+                yield ParseError(f'Некорректный JSON: {exc}')
+
+
+class ImageUploadParser(FileUploadParser):
+    """
+    Изображение сырым телом запроса (Content-Type: image/*).
+
+    Читается кусками через upload handlers запроса, файл - в
+    request.data['file']. Имя из Content-Disposition не обязательно:
+    в хранилище файл всё равно получает своё.
+    """
+    media_type = 'image/*'
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(stream, media_type,
+                                    parser_context) or 'upload'
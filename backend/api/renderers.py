@@ -0,0 +1,28 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class _TextRenderer(BaseRenderer):
+    """
+    Формат для ?format= у выгрузок. Сами выгрузки отдаются потоком,
+    через рендерер проходят только ошибки.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class PlainTextRenderer(_TextRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(_TextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
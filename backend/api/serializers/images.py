@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from api.services import images
+
+
+class ImageVariantField(serializers.Field):
+    """
+    URL WebP-варианта изображения (api.services.images); пока вариант
+    не построен - URL оригинала.
+    """
+
+    def __init__(self, field='image', variant='full', **kwargs):
+        self.image_field = field
+        self.variant = variant
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        url = images.variant_url(instance, self.image_field, self.variant)
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -1,6 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
+from api.serializers.images import ImageVariantField
 from api.serializers.users import CustomUserSerializer
+from api.services import counters, images, shopping_list
+from api.services.toggles import BATCH_LIMIT
 from recipes.models import (
     Ingredient,
     Recipe,
@@ -8,6 +12,7 @@ from recipes.models import (
     Favorite,
     ShoppingCart
 )
+from users.models import CustomUser
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -35,24 +40,38 @@ class RecipeListSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     author = CustomUserSerializer(read_only=True)
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = [
-            'id', 'author', 'name', 'text', 'image', 'cooking_time',
-            'ingredients', 'is_favorited', 'is_in_shopping_cart'
+            'id', 'author', 'name', 'text', 'image', 'image_variants',
+            'cooking_time', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart'
         ]
 
     def get_image(self, obj):
-        request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url'):
-            return request.build_absolute_uri(obj.image.url)
+        # Лента - 'card', детальная страница - 'full' (RecipeViewSet)
+        variant = self.context.get('image_variant', 'full')
+        url = images.variant_url(obj, 'image', variant)
+        if url:
+            return self.context['request'].build_absolute_uri(url)
         return ""
 
+    def get_image_variants(self, obj):
+        request = self.context['request']
+        return {
+            variant: request.build_absolute_uri(
+                images.variant_url(obj, 'image', variant)
+            )
+            for variant in images.VARIANTS
+        } if obj.image else {}
+
     def get_ingredients(self, obj):
-        ingredients = obj.ingredient_amounts.select_related('ingredient').all()
+        # Без select_related здесь: он бы обошёл prefetch из RecipeViewSet
+        ingredients = obj.ingredient_amounts.all()
         return IngredientInRecipeSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
@@ -89,7 +108,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                   'cooking_time',
                   'ingredients']
 
-    def validate_ingredients(self, value):
+    @staticmethod
+    def check_ingredient_list(value):
+        """Проверки состава без БД; возвращает id ингредиентов"""
         if not value:
             raise serializers.ValidationError(
                 'Нужен хотя бы один ингредиент.'
@@ -100,16 +121,24 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.'
             )
+        return set(ingredient_ids)
 
+    @staticmethod
+    def missing_ingredients_message(missing):
+        return (f'Ингредиенты с id={", ".join(map(str, sorted(missing)))} '
+                'не существуют.')
+
+    def validate_ingredients(self, value):
+        ingredient_ids = self.check_ingredient_list(value)
         existing_ids = set(
             Ingredient.objects
             .filter(id__in=ingredient_ids)
             .values_list('id', flat=True)
         )
-        missing = set(ingredient_ids) - existing_ids
+        missing = ingredient_ids - existing_ids
         if missing:
             raise serializers.ValidationError(
-                f'Ингредиенты с id={", ".join(map(str, missing))} не существуют.'
+                self.missing_ingredients_message(missing)
             )
         return value
 
@@ -127,24 +156,63 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         return value
 
-    def _set_ingredients(self, recipe, ingredients_data):
-        IngredientInRecipe.objects.filter(recipe=recipe).delete()
-        bulk = [
-            IngredientInRecipe(
-                recipe=recipe,
-                ingredient=Ingredient.objects.get(id=item['id']),
-                amount=item['amount']
-            )
-            for item in ingredients_data
+    def _set_ingredients(self, recipe, ingredients_data, created=False):
+        """
+        Привести состав рецепта к ingredients_data.
+
+        Id ингредиентов уже проверены в validate_ingredients, поэтому
+        строки создаются по ingredient_id. Меняются только добавленные,
+        удалённые и изменённые позиции - не больше трёх запросов
+        независимо от числа ингредиентов.
+        """
+        amounts = {item['id']: item['amount'] for item in ingredients_data}
+        existing = {} if created else {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects
+            .filter(recipe=recipe)
+            .only('id', 'ingredient_id', 'amount')
+        }
+
+        removed = existing.keys() - amounts.keys()
+        changed = []
+        for ingredient_id, row in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            IngredientInRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                               amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
         ]
-        IngredientInRecipe.objects.bulk_create(bulk)
 
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        if added:
+            IngredientInRecipe.objects.bulk_create(added)
+
+        # Списки покупок тех, у кого рецепт в корзине (у нового - ни у кого)
+        touched = removed | {row.ingredient_id for row in changed + added}
+        if touched and not created:
+            shopping_list.rebuild(shopping_list.cart_user_ids(recipe.id),
+                                  touched)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
-        self._set_ingredients(recipe, ingredients_data)
+        self._set_ingredients(recipe, ingredients_data, created=True)
+        counters.increment(CustomUser, recipe.author_id, recipes_count=1)
+        images.schedule_variants(recipe, 'image',
+                                 ['recipes', f'recipe:{recipe.pk}'])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.get('ingredients')
         if ingredients_data is None:
@@ -156,12 +224,41 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             if attr != 'ingredients':
                 setattr(instance, attr, value)
         instance.save()
+        if 'image' in validated_data:
+            images.schedule_variants(instance, 'image',
+                                     ['recipes', f'recipe:{instance.pk}'])
 
         self._set_ingredients(instance, ingredients_data)
         return instance
 
 
+class RecipeImportSerializer(RecipeCreateSerializer):
+    """
+    Элемент массового импорта. Существование ингредиентов проверяется
+    одним запросом на пачку в api.services.recipe_import.
+    """
+    author = None
+
+    class Meta(RecipeCreateSerializer.Meta):
+        fields = ['name', 'text', 'image', 'cooking_time', 'ingredients']
+
+    def validate_ingredients(self, value):
+        self.check_ingredient_list(value)
+        return value
+
+
+class RecipeIdListSerializer(serializers.Serializer):
+    """Тело пакетных запросов избранного и корзины"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_LIMIT,
+    )
+
+
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = ImageVariantField('image', 'thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
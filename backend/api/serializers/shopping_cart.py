@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from recipes.models import Recipe
+from api.serializers.images import ImageVariantField
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
+    image = ImageVariantField('image', 'thumb')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
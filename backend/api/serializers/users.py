@@ -2,6 +2,8 @@ from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from users.models.user import CustomUser
 from drf_extra_fields.fields import Base64ImageField
+from api.serializers.images import ImageVariantField
+from api.services import images
 import re
 
 
@@ -12,6 +14,12 @@ class AvatarSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # Аватар есть и в карточках рецептов
+        images.schedule_variants(instance, 'avatar', ['users', 'recipes'])
+        return instance
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     class Meta(UserCreateSerializer.Meta):
@@ -27,6 +35,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 
 class CustomUserSerializer(UserSerializer):
+    avatar = ImageVariantField('avatar', 'thumb')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
@@ -41,4 +50,16 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return request.user.subscriptions.filter(author=obj).exists()
+        # Аннотация Exists из queryset view (CustomUserViewSet, подписки)
+        annotated = getattr(obj, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
+        # Иначе - все подписки пользователя одним запросом на сериализацию:
+        # контекст общий у корневого и вложенных сериализаторов.
+        subscribed_ids = self.context.get('subscribed_ids')
+        if subscribed_ids is None:
+            subscribed_ids = set(
+                request.user.subscriptions.values_list('author_id', flat=True)
+            )
+            self.context['subscribed_ids'] = subscribed_ids
+        return obj.id in subscribed_ids
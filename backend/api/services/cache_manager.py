@@ -1,9 +1,344 @@
 import os
 import json
+import logging
 import redis
 import hashlib
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, Optional, Callable
+from typing import Any, Dict, Iterable, Optional, Callable, Tuple, Union
+
+from django.db import transaction
+
+from api.services import cache_metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """Ограниченный пул соединений с подсчётом занятых и ожидающих"""
+
+    def reset(self):
+        self._stats_lock = threading.Lock()
+        self._in_use = 0
+        self._waiting = 0
+        super().reset()
+
+    def get_connection(self, command_name, *keys, **options):
+        with self._stats_lock:
+            self._waiting += 1
+        try:
+            connection = super().get_connection(command_name, *keys, **options)
+        finally:
+            with self._stats_lock:
+                self._waiting -= 1
+        with self._stats_lock:
+            self._in_use += 1
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        with self._stats_lock:
+            self._in_use = max(self._in_use - 1, 0)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                'max_connections': self.max_connections,
+                'created': len(self._connections),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+            }
+
+
+class CacheCodec:
+    """
+    Кодирование значений кэша: формат, сжатие больших значений и байт
+    заголовка.
+
+    Заголовок 0x80 | (формат << 3) | сжатие не может начинать JSON-текст,
+    поэтому значения, записанные до появления кодеков (plain JSON), читаются
+    как раньше. Декодируются все известные форматы независимо от текущих
+    настроек - это позволяет менять CACHE_CODEC без сброса кэша.
+    """
+
+    HEADER_FLAG = 0x80
+    FORMATS = {'json': 0, 'orjson': 1, 'msgpack': 2}
+    COMPRESSIONS = {'none': 0, 'zstd': 1, 'lz4': 2}
+
+    def __init__(self, fmt: str = 'orjson', compression: str = 'zstd',
+                 compress_min_bytes: int = 1024, zstd_level: int = 3):
+        if fmt == 'orjson' and orjson is None:
+            logger.warning("orjson не установлен, кэш использует json")
+            fmt = 'json'
+        if fmt == 'msgpack' and msgpack is None:
+            logger.warning("msgpack не установлен, кэш использует json")
+            fmt = 'json'
+        if ((compression == 'zstd' and zstandard is None)
+                or (compression == 'lz4' and lz4_frame is None)):
+            logger.warning("%s не установлен, кэш хранится без сжатия",
+                           compression)
+            compression = 'none'
+
+        self.format_name = fmt
+        self.compression_name = compression
+        self.format = self.FORMATS[fmt]
+        self.compression = self.COMPRESSIONS[compression]
+        self.compress_min_bytes = compress_min_bytes
+        self.zstd_level = zstd_level
+
+    @classmethod
+    def from_env(cls) -> 'CacheCodec':
+        return cls(
+            fmt=os.getenv('CACHE_CODEC', 'orjson'),
+            compression=os.getenv('CACHE_COMPRESSION', 'zstd'),
+            compress_min_bytes=int(
+                os.getenv('CACHE_COMPRESS_MIN_BYTES', 1024)
+            ),
+        )
+
+    @property
+    def name(self) -> str:
+        return f"{self.format_name}+{self.compression_name}"
+
+    def encode(self, value: Any) -> bytes:
+        return self.encode_sized(value)[0]
+
+    def encode_sized(self, value: Any) -> Tuple[bytes, int]:
+        """Закодированное значение и размер данных до сжатия"""
+        payload = self._serialize(value)
+        size = len(payload)
+        compression = 0
+        if self.compression and size >= self.compress_min_bytes:
+            compression = self.compression
+            payload = self._compress(payload)
+        header = self.HEADER_FLAG | (self.format << 3) | compression
+        return bytes((header,)) + payload, size
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return self.decode_sized(data)[0]
+
+    def decode_sized(self, data: Union[bytes, str]) -> Tuple[Any, int]:
+        """Значение и размер данных после распаковки"""
+        if isinstance(data, str) or not data or not data[0] & self.HEADER_FLAG:
+            return json.loads(data), len(data)
+
+        header = data[0]
+        fmt = (header >> 3) & 0x0F
+        compression = header & 0x07
+        payload = self._decompress(compression, data[1:])
+        return self._deserialize(fmt, payload), len(payload)
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.format == self.FORMATS['orjson']:
+            return orjson.dumps(value)
+        if self.format == self.FORMATS['msgpack']:
+            return msgpack.packb(value, use_bin_type=True)
+        return json.dumps(value, ensure_ascii=False).encode()
+
+    def _deserialize(self, fmt: int, payload: bytes) -> Any:
+        if fmt == self.FORMATS['orjson']:
+            return orjson.loads(payload)
+        if fmt == self.FORMATS['msgpack']:
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload)
+
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == self.COMPRESSIONS['zstd']:
+            return zstandard.compress(payload, self.zstd_level)
+        return lz4_frame.compress(payload)
+
+    def _decompress(self, compression: int, payload: bytes) -> bytes:
+        if compression == self.COMPRESSIONS['zstd']:
+            return zstandard.decompress(payload)
+        if compression == self.COMPRESSIONS['lz4']:
+            return lz4_frame.decompress(payload)
+        return payload
+
+
+class LocalCache:
+    """
+    Кэш процесса (L1): LRU с ограничением по суммарному размеру и TTL.
+
+    Хранит уже десериализованные значения, поэтому их нельзя изменять
+    на месте. Размер записи - длина её сериализованного представления
+    без сжатия: сжатая длина занижала бы занятую память в разы.
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, size, expires_at, namespaces)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any, size: int,
+            ttl: Optional[int] = None,
+            namespaces: Iterable[str] = ()) -> None:
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at,
+                                  frozenset(namespaces))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, namespaces: Iterable[str]) -> None:
+        namespaces = set(namespaces)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry[3] & namespaces]
+            for key in stale:
+                self._remove(key)
+
+    def discard(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry[1]
+
+
+class CachePipeline:
+    """
+    Группа операций кэша, отправляемая в Redis одним запросом.
+
+    Используется как контекстный менеджер (CacheManager.pipeline()):
+    команды выполняются при выходе из блока with. Ошибки Redis и
+    сериализации логируются и не пробрасываются, как и в одиночных
+    методах CacheManager. Значения пишутся только в Redis, минуя L1.
+    """
+
+    def __init__(self, cache: 'CacheManager'):
+        self.cache = cache
+        self._pipe = cache.client.pipeline(transaction=False)
+        self._namespaces = []
+        self._deleted = []
+        self.results = None
+
+    def __enter__(self) -> 'CachePipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self._pipe.reset()
+        return False
+
+    def set(self, key: str, value: Any,
+            ttl: Optional[int] = None) -> 'CachePipeline':
+        try:
+            serialized_value = self.cache.codec.encode(value)
+        except Exception as e:
+            cache_metrics.record_error('encode')
+            logger.warning("Ошибка записи в кэш (key=%s): %s", key, e)
+            return self
+        cache_metrics.record_set(key, len(serialized_value))
+        if ttl:
+            self._pipe.setex(key, ttl, serialized_value)
+        else:
+            self._pipe.set(key, serialized_value)
+        return self
+
+    def delete(self, *keys: str) -> 'CachePipeline':
+        if keys:
+            self._pipe.unlink(*keys)
+            # Удалённые ключи - и из L1 остальных процессов
+            self._pipe.publish(INVALIDATION_CHANNEL,
+                               json.dumps({'keys': list(keys)}))
+            self._deleted.extend(keys)
+        return self
+
+    def bump_generations(self, *namespaces: str) -> 'CachePipeline':
+        if namespaces:
+            for ns in namespaces:
+                self._pipe.incr(make_generation_key(ns))
+            self._pipe.publish(INVALIDATION_CHANNEL,
+                               json.dumps(list(namespaces)))
+            self._namespaces.extend(namespaces)
+            cache_metrics.record_invalidation(namespaces)
+        return self
+
+    def execute(self) -> bool:
+        local = self.cache.local
+        if local is not None:
+            local.discard(*self._deleted)
+            local.invalidate(self._namespaces)
+        try:
+            with cache_metrics.redis_timer('pipeline'):
+                self.results = self._pipe.execute()
+            return True
+        except Exception as e:
+            cache_metrics.record_error('pipeline')
+            logger.warning("Ошибка пакетной операции кэша: %s", e)
+            return False
+        finally:
+            self._pipe.reset()
+            self._namespaces = []
+            self._deleted = []
 
 
 class CacheManager:
@@ -11,79 +346,404 @@ class CacheManager:
         self.redis_host = os.getenv('REDIS_HOST', 'localhost')
         self.redis_port = int(os.getenv('REDIS_PORT', 6379))
         self.redis_password = os.getenv('REDIS_PASSWORD', None)
-        
-        self.client = redis.Redis(
+        self.max_connections = int(os.getenv('REDIS_MAX_CONNECTIONS', 20))
+        self.pool_timeout = float(os.getenv('REDIS_POOL_TIMEOUT', 2))
+
+        # Соединения открываются лениво при первой команде; после fork
+        # пул сам пересоздаёт их в дочернем процессе (см. _checkpid).
+        self.pool = InstrumentedConnectionPool(
             host=self.redis_host,
             port=self.redis_port,
             password=self.redis_password,
-            decode_responses=True,
+            decode_responses=False,
             socket_connect_timeout=5,
-            socket_timeout=5
+            socket_timeout=5,
+            max_connections=self.max_connections,
+            timeout=self.pool_timeout,
         )
-        
+        self.client = redis.Redis(connection_pool=self.pool)
+        self.codec = CacheCodec.from_env()
+        self.redis_hits = 0
+        self.redis_misses = 0
+
+        # L1 включается для вызовов с local=True; CACHE_L1_MAX_BYTES=0
+        # отключает его полностью.
+        l1_max_bytes = int(os.getenv('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024))
+        l1_ttl = int(os.getenv('CACHE_L1_TTL', 30))
+        self.local = LocalCache(l1_max_bytes, l1_ttl) if l1_max_bytes else None
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """Метрики пула: создано, занято и ожидает соединений"""
+        return self.pool.get_stats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики L1 и Redis раздельно, плюс состояние пула"""
+        return {
+            'l1': self.local.get_stats() if self.local else None,
+            'redis': {'hits': self.redis_hits, 'misses': self.redis_misses},
+            'pool': self.get_pool_stats(),
+        }
+
+    def _use_local(self, local: bool) -> bool:
+        if not local or self.local is None:
+            return False
+        return self._ensure_listener()
+
+    def _ensure_listener(self) -> bool:
+        """Подписка на канал инвалидации L1 (фоновый поток процесса)"""
+        if self._listener is not None:
+            return True
+        with self._listener_lock:
+            if self._listener is None:
+                try:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(
+                        **{INVALIDATION_CHANNEL: self._on_invalidation}
+                    )
+                    self._listener = pubsub.run_in_thread(
+                        sleep_time=1,
+                        daemon=True,
+                        exception_handler=self._on_listener_error,
+                    )
+                except Exception as e:
+                    logger.warning("Ошибка подписки на инвалидацию L1: %s", e)
+                    return False
+        return True
+
+    def _on_invalidation(self, message: Dict[str, Any]) -> None:
+        """Список пространств имён или {"keys": [...]} удалённых ключей"""
         try:
-            self.client.ping()
-            print(f"✓ Подключено к Redis: {self.redis_host}:{self.redis_port}")
-        except redis.ConnectionError as e:
-            print(f"✗ Ошибка подключения к Redis: {e}")
-            raise
-    
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+            payload = json.loads(message['data'])
+        except (TypeError, ValueError):
+            self.local.clear()
+            return
+        if isinstance(payload, dict):
+            self.local.discard(*payload.get('keys', ()))
+        else:
+            self.local.invalidate(payload)
+
+    def _on_listener_error(self, error, pubsub, thread) -> None:
+        # Сообщения могли потеряться - L1 больше нельзя доверять.
+        logger.warning("Ошибка канала инвалидации L1: %s", error)
+        self.local.clear()
+        time.sleep(1)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None,
+            local: bool = False,
+            namespaces: Iterable[str] = ()) -> bool:
+        return self._set_raw(key, value, ttl, local, namespaces)
+
+    def get(self, key: str, local: bool = False,
+            namespaces: Iterable[str] = ()) -> Optional[Any]:
+        data = self._get_raw(key, local, namespaces)
+        if data is None:
+            return None
+        return _unwrap_entry(data)[0]
+
+    def _set_raw(self, key: str, value: Any, ttl: Optional[int],
+                 local: bool, namespaces: Iterable[str]) -> bool:
         try:
-            serialized_value = json.dumps(value, ensure_ascii=False)
-            
-            if ttl:
-                self.client.setex(key, ttl, serialized_value)
-            else:
-                self.client.set(key, serialized_value)
-            
+            serialized_value, size = self.codec.encode_sized(value)
+
+            with cache_metrics.redis_timer('set'):
+                if ttl:
+                    self.client.setex(key, ttl, serialized_value)
+                else:
+                    self.client.set(key, serialized_value)
+            cache_metrics.record_set(key, len(serialized_value))
+
+            if self._use_local(local):
+                self.local.set(key, value, size, ttl, namespaces)
             return True
         except Exception as e:
-            print(f"Ошибка записи в кэш (key={key}): {e}")
+            cache_metrics.record_error('set')
+            logger.warning("Ошибка записи в кэш (key=%s): %s", key, e)
             return False
-    
-    def get(self, key: str) -> Optional[Any]:
+
+    def _get_raw(self, key: str, local: bool,
+                 namespaces: Iterable[str]) -> Optional[Any]:
+        use_local = self._use_local(local)
+        if use_local:
+            value = self.local.get(key)
+            if value is not None:
+                cache_metrics.record_hit(key, 'l1')
+                return value
+            cache_metrics.record_miss(key, 'l1')
+
         try:
-            value = self.client.get(key)
-            
-            if value is None:
+            with cache_metrics.redis_timer('get'):
+                raw_value = self.client.get(key)
+
+            if raw_value is None:
+                self.redis_misses += 1
+                cache_metrics.record_miss(key, 'redis')
                 return None
-            
-            return json.loads(value)
+
+            self.redis_hits += 1
+            cache_metrics.record_hit(key, 'redis')
+            value, size = self.codec.decode_sized(raw_value)
+            if use_local:
+                self.local.set(key, value, size, namespaces=namespaces)
+            return value
         except Exception as e:
-            print(f"Ошибка чтения из кэша (key={key}): {e}")
+            cache_metrics.record_error('get')
+            logger.warning("Ошибка чтения из кэша (key=%s): %s", key, e)
             return None
     
     def delete(self, key: str) -> bool:
+        if self.local is not None:
+            self.local.discard(key)
         try:
-            return bool(self.client.delete(key))
+            with cache_metrics.redis_timer('delete'):
+                pipe = self.client.pipeline()
+                pipe.delete(key)
+                pipe.publish(INVALIDATION_CHANNEL,
+                             json.dumps({'keys': [key]}))
+                return bool(pipe.execute()[0])
         except Exception as e:
-            print(f"Ошибка удаления из кэша (key={key}): {e}")
+            cache_metrics.record_error('delete')
+            logger.warning("Ошибка удаления из кэша (key=%s): %s", key, e)
             return False
-    
-    def delete_pattern(self, pattern: str) -> int:
+
+    def pipeline(self) -> CachePipeline:
+        """Сгруппировать несколько операций в один запрос к Redis"""
+        return CachePipeline(self)
+
+    def get_many(self, keys: Iterable[str], local: bool = False,
+                 namespaces: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Значения ключей одним MGET; промахи в ответ не попадают.
+
+        namespaces - как у get: прочитанное в L1 сбрасывается вместе
+        с этими пространствами имён.
+        """
+        result = {}
+        missing = []
+        namespaces = tuple(namespaces)
+        use_local = self._use_local(local)
+        for key in keys:
+            data = self.local.get(key) if use_local else None
+            if use_local:
+                if data is None:
+                    cache_metrics.record_miss(key, 'l1')
+                else:
+                    cache_metrics.record_hit(key, 'l1')
+            if data is None:
+                missing.append(key)
+            else:
+                result[key] = _unwrap_entry(data)[0]
+        if not missing:
+            return result
+
         try:
-            keys = self.client.keys(pattern)
-            if keys:
-                return self.client.delete(*keys)
-            return 0
+            with cache_metrics.redis_timer('mget'):
+                raw_values = self.client.mget(missing)
         except Exception as e:
-            print(f"Ошибка удаления по паттерну (pattern={pattern}): {e}")
+            cache_metrics.record_error('mget')
+            logger.warning("Ошибка чтения из кэша (%d ключей): %s",
+                           len(missing), e)
+            return result
+
+        for key, raw_value in zip(missing, raw_values):
+            if raw_value is None:
+                self.redis_misses += 1
+                cache_metrics.record_miss(key, 'redis')
+                continue
+            try:
+                data, size = self.codec.decode_sized(raw_value)
+            except Exception as e:
+                cache_metrics.record_error('decode')
+                logger.warning("Ошибка чтения из кэша (key=%s): %s", key, e)
+                continue
+            self.redis_hits += 1
+            cache_metrics.record_hit(key, 'redis')
+            if use_local:
+                self.local.set(key, data, size, namespaces=namespaces)
+            result[key] = _unwrap_entry(data)[0]
+        return result
+
+    def set_many(self, mapping: Dict[str, Any],
+                 ttl: Union[int, Dict[str, int], None] = None) -> bool:
+        """Записать ключи одним pipeline; ttl - общий или по ключам"""
+        with self.pipeline() as batch:
+            for key, value in mapping.items():
+                key_ttl = ttl.get(key) if isinstance(ttl, dict) else ttl
+                batch.set(key, value, key_ttl)
+        return batch.results is not None
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        keys = list(keys)
+        if not keys:
             return 0
+        with self.pipeline() as batch:
+            batch.delete(*keys)
+        return batch.results[0] if batch.results else 0
     
-    def get_or_set(self, key: str, factory_func, ttl: Optional[int] = None) -> Any:
-        cached_value = self.get(key)
-        
-        if cached_value is not None:
-            print(f"✓ Данные получены из кэша: {key}")
-            return cached_value
-        
-        print(f"→ Кэш промах, вычисляем: {key}")
-        value = factory_func()
-        
-        self.set(key, value, ttl)
-        
-        return value
+    def get_generations(self, namespaces: Iterable[str],
+                        local: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Текущие номера поколений пространств имён (одним MGET).
+
+        С local=True поколения берутся из L1, пока их не сбросит
+        сообщение об инвалидации или TTL L1.
+        """
+        generations = {}
+        missing = []
+        use_local = self._use_local(local)
+        for ns in namespaces:
+            generation = None
+            if use_local:
+                generation = self.local.get(make_generation_key(ns))
+            if generation is None:
+                missing.append(ns)
+            else:
+                generations[ns] = generation
+        if not missing:
+            return generations
+
+        try:
+            with cache_metrics.redis_timer('mget'):
+                values = self.client.mget(
+                    [make_generation_key(ns) for ns in missing]
+                )
+        except Exception as e:
+            cache_metrics.record_error('mget')
+            logger.warning("Ошибка чтения поколений (%s): %s",
+                           ', '.join(missing), e)
+            return None
+        for ns, value in zip(missing, values):
+            generations[ns] = int(value or 0)
+            if use_local:
+                self.local.set(make_generation_key(ns), generations[ns],
+                               GENERATION_ENTRY_SIZE, namespaces=[ns])
+        return generations
+
+    def bump_generations(self, *namespaces: str) -> bool:
+        """
+        Инвалидировать пространства имён: INCR поколения.
+
+        Старые ключи больше не адресуются и истекают по своему TTL.
+        """
+        if not namespaces:
+            return True
+        return self.pipeline().bump_generations(*namespaces).execute()
+
+    def make_key(self, prefix: str, namespaces: Iterable[str],
+                 *args, local: bool = False, **kwargs) -> Optional[str]:
+        """Ключ кэша с учётом поколений пространств имён"""
+        generations = self.get_generations(namespaces, local=local)
+        if generations is None:
+            return None
+        return make_cache_key(prefix, generations, *args, **kwargs)
+
+    def get_or_set(self, key: str, factory_func,
+                   ttl: Optional[int] = None, local: bool = False,
+                   namespaces: Iterable[str] = ()) -> Any:
+        """
+        Значение из кэша или результат factory_func с защитой от лавины.
+
+        Пересчитывает только владелец короткой блокировки в Redis, остальные
+        получают устаревшее значение или недолго ждут нового. Ключ
+        обновляется заранее с вероятностью, растущей к концу TTL (XFetch),
+        а сам TTL размывается, чтобы ключи не истекали одновременно.
+        """
+        return self.get_or_set_entry(key, factory_func, ttl, local,
+                                     namespaces)[0]
+
+    def get_or_set_entry(self, key: str, factory_func,
+                         ttl: Optional[int] = None, local: bool = False,
+                         namespaces: Iterable[str] = ()
+                         ) -> Tuple[Any, Optional[float]]:
+        """
+        То же, что get_or_set, но возвращает (значение, время вычисления).
+
+        Время вычисления (unix time) известно только для записей с ttl,
+        иначе None.
+        """
+        data = self._get_raw(key, local, namespaces)
+        if data is not None:
+            value, delta, expires_at = _unwrap_entry(data)
+            if not _should_refresh(delta, expires_at):
+                return value, _entry_computed_at(data)
+
+            lock = self._acquire_lock(key)
+            if lock is None or lock is LOCK_UNAVAILABLE:
+                cache_metrics.record_stale(key)
+                return value, _entry_computed_at(data)
+            logger.debug("Досрочное обновление кэша: %s", key)
+            return self._compute(key, factory_func, ttl, local, namespaces,
+                                 lock)
+
+        lock = self._acquire_lock(key)
+        if lock is LOCK_UNAVAILABLE:
+            # Redis недоступен: ждать нечего, считаем сами
+            lock = None
+        elif lock is None:
+            data = self._wait_for(key, local, namespaces)
+            if data is not None:
+                return _unwrap_entry(data)[0], _entry_computed_at(data)
+
+        logger.debug("Кэш промах, вычисляем: %s", key)
+        return self._compute(key, factory_func, ttl, local, namespaces, lock)
+
+    def _compute(self, key: str, factory_func, ttl: Optional[int],
+                 local: bool, namespaces: Iterable[str],
+                 lock) -> Tuple[Any, Optional[float]]:
+        try:
+            computed_at = time.time()
+            started = time.monotonic()
+            value = factory_func()
+            delta = time.monotonic() - started
+            cache_metrics.record_compute(key, delta)
+
+            if ttl:
+                ttl = _jitter_ttl(ttl)
+                entry = {
+                    ENTRY_VALUE: value,
+                    ENTRY_META: [delta, time.time() + ttl, computed_at],
+                }
+                self._set_raw(key, entry, ttl + STALE_TTL, local, namespaces)
+                return value, computed_at
+            self._set_raw(key, value, None, local, namespaces)
+            return value, None
+        finally:
+            if lock is not None:
+                self._release_lock(lock)
+
+    def _acquire_lock(self, key: str):
+        """
+        Блокировка пересчёта; None - её держит другой процесс,
+        LOCK_UNAVAILABLE - Redis не ответил.
+        """
+        try:
+            lock = self.client.lock(f"{LOCK_PREFIX}:{key}", timeout=LOCK_TTL,
+                                    blocking=False)
+            if lock.acquire():
+                return lock
+        except Exception as e:
+            cache_metrics.record_error('lock')
+            logger.warning("Ошибка блокировки (key=%s): %s", key, e)
+            return LOCK_UNAVAILABLE
+        return None
+
+    def _release_lock(self, lock) -> None:
+        try:
+            lock.release()
+        except Exception:
+            # Блокировка уже истекла по таймауту - освобождать нечего.
+            pass
+
+    def _wait_for(self, key: str, local: bool,
+                  namespaces: Iterable[str]) -> Optional[Any]:
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            data = self._get_raw(key, local, namespaces)
+            if data is not None:
+                return data
+        return None
 
 
 class CacheTTL:
@@ -97,12 +757,106 @@ class CacheTTL:
     WEEK = 604800
 
 
+# Защита от лавины промахов (см. CacheManager.get_or_set)
+ENTRY_VALUE = '__value__'
+ENTRY_META = '__cache__'
+LOCK_PREFIX = 'lock'
+LOCK_TTL = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+LOCK_UNAVAILABLE = object()
+STALE_TTL = CacheTTL.MINUTE
+TTL_JITTER = 0.1
+XFETCH_BETA = 1.0
+
+
+def _unwrap_entry(data: Any):
+    """(value, время вычисления, логическое истечение) записи кэша"""
+    if isinstance(data, dict) and ENTRY_META in data and ENTRY_VALUE in data:
+        delta, expires_at = data[ENTRY_META][:2]
+        return data[ENTRY_VALUE], delta, expires_at
+    return data, 0.0, math.inf
+
+
+def _entry_computed_at(data: Any) -> Optional[float]:
+    """Время вычисления записи (в старых записях не хранится)"""
+    if isinstance(data, dict) and ENTRY_META in data and ENTRY_VALUE in data:
+        meta = data[ENTRY_META]
+        if len(meta) > 2:
+            return meta[2]
+    return None
+
+
+def _should_refresh(delta: float, expires_at: float) -> bool:
+    # XFetch: now - delta * beta * ln(rand) >= expiry
+    return (time.time() - delta * XFETCH_BETA * math.log(1.0 - random.random())
+            >= expires_at)
+
+
+def _jitter_ttl(ttl: int) -> int:
+    return max(1, round(ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)))
+
+
+GENERATION_PREFIX = 'gen'
+GENERATION_ENTRY_SIZE = 64
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+
+def make_generation_key(namespace: str) -> str:
+    return f"{GENERATION_PREFIX}:{namespace}"
+
+
+_cache_manager: Optional[CacheManager] = None
+_cache_manager_lock = threading.Lock()
+
+
+def _reset_cache_manager_after_fork():
+    global _cache_manager, _cache_manager_lock
+    _cache_manager = None
+    _cache_manager_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_cache_manager_after_fork)
+
+
 def get_cache_manager() -> Optional[CacheManager]:
+    """Общий CacheManager процесса (gunicorn/Celery worker)"""
+    global _cache_manager
+    if _cache_manager is not None:
+        return _cache_manager
+
+    with _cache_manager_lock:
+        if _cache_manager is None:
+            try:
+                _cache_manager = CacheManager()
+                logger.info(
+                    "Пул Redis создан: %s:%s (max=%s)",
+                    _cache_manager.redis_host, _cache_manager.redis_port,
+                    _cache_manager.max_connections,
+                )
+            except Exception as e:
+                logger.warning(
+                    "Redis недоступен, кэширование отключено: %s", e
+                )
+                return None
+    return _cache_manager
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    """Сбросить персональные ответы пользователя (поколение user:<id>)"""
     try:
-        return CacheManager()
+        cache = get_cache_manager()
+        if cache:
+            cache.bump_generations(f"user:{user_id}")
     except Exception as e:
-        print(f"Redis недоступен, кэширование отключено: {e}")
-        return None
+        logger.warning("Не удалось сбросить кэш user:%s: %s", user_id, e)
+
+
+def get_cache_stats() -> Optional[Dict[str, Any]]:
+    """Статистика менеджера процесса, если он уже создан (не создаёт его)"""
+    manager = _cache_manager
+    return manager.get_stats() if manager is not None else None
 
 
 def make_cache_key(prefix: str, *args, **kwargs) -> str:
@@ -116,70 +870,203 @@ def make_cache_key(prefix: str, *args, **kwargs) -> str:
     return f"{prefix}:{params_hash}"
 
 
-def cache_queryset(cache_key_prefix: str, ttl: int = CacheTTL.FIVE_MINUTES):
+class _UncacheableResponse(Exception):
+    """Ответ view не подлежит кэшированию (не 2xx)"""
+
+
+def _make_etag(*parts: Any) -> str:
+    source = ':'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.md5(source.encode()).hexdigest()
+
+
+def _content_hash(data: Any) -> str:
+    source = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение If-None-Match (RFC 9110, 13.1.2)"""
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        candidate.strip().removeprefix('W/') == etag
+        for candidate in if_none_match.split(',')
+    )
+
+
+def _not_modified(etag: Optional[str], last_modified: Optional[float]):
+    from django.http import HttpResponseNotModified
+    from django.utils.http import http_date
+
+    response = HttpResponseNotModified()
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cache_queryset(cache_key_prefix: str, ttl: int = CacheTTL.FIVE_MINUTES,
+                   namespaces: Optional[Iterable[str]] = None,
+                   per_user: Union[bool, Callable] = True,
+                   local: bool = False,
+                   personalize: Optional[Callable] = None,
+                   conditional: bool = False):
+    """
+    Кэширует ответ view.
+
+    namespaces - шаблоны пространств имён, чьи поколения входят в ключ;
+    подставляются kwargs view (например 'recipe:{pk}'). При per_user
+    (или если per_user(request) истинно) ответы для авторизованного
+    пользователя кэшируются отдельно и дополнительно зависят от
+    'user:<id>'. local включает L1 для общих (не персональных) ответов.
+    personalize(request, data) -> data накладывает персональные поля на
+    общий ответ и вызывается для каждого запроса, в том числе при промахе.
+
+    conditional добавляет ETag (ключ с поколениями и время вычисления
+    записи, а для personalize - ещё и поколение 'user:<id>') и
+    Last-Modified (время вычисления записи). Совпавший If-None-Match
+    даёт 304 без сериализации ответа, а при попадании в кэш - и без
+    обращения к view.
+    """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            cache = get_cache_manager()
-            if not cache:
-                return func(*args, **kwargs)
-            
             request = None
             if len(args) > 1:
                 request = args[1]
-            
+
+            def finish(response):
+                if personalize and request is not None:
+                    response.data = personalize(request, response.data)
+                return response
+
+            cache = get_cache_manager()
+            if not cache:
+                return finish(func(*args, **kwargs))
+
             cache_params = {}
+            entry_namespaces = [ns.format(**kwargs) for ns in namespaces or ()]
+            use_local = local
             if request:
                 cache_params.update(dict(request.GET.items()))
-                if hasattr(request, 'user') and request.user.is_authenticated:
+                is_personal = (per_user(request) if callable(per_user)
+                               else per_user)
+                if (is_personal and hasattr(request, 'user')
+                        and request.user.is_authenticated):
                     cache_params['user_id'] = request.user.id
-            
-            cache_key = make_cache_key(cache_key_prefix, **cache_params)
-            
-            cached_data = cache.get(cache_key)
-            if cached_data is not None:
-                print(f"✓ Данные из кэша: {cache_key}")
+                    entry_namespaces.append(f"user:{request.user.id}")
+                    use_local = False
+            cache_params.update(kwargs)
+
+            cache_key = cache.make_key(cache_key_prefix, entry_namespaces,
+                                       local=use_local, **cache_params)
+            if cache_key is None:
+                return finish(func(*args, **kwargs))
+
+            overlaid = bool(personalize and request is not None
+                            and getattr(request, 'user', None) is not None
+                            and request.user.is_authenticated)
+            user_generation = None
+            if conditional and overlaid:
+                user_ns = f"user:{request.user.id}"
+                generations = cache.get_generations([user_ns])
+                if generations is not None:
+                    user_generation = (user_ns, generations[user_ns])
+
+            computed = {}
+
+            def compute():
+                response = func(*args, **kwargs)
+                computed['response'] = response
+                if not (hasattr(response, 'data')
+                        and hasattr(response, 'status_code')
+                        and 200 <= response.status_code < 300):
+                    raise _UncacheableResponse
+                return response.data
+
+            try:
+                data, computed_at = cache.get_or_set_entry(
+                    cache_key, compute, ttl, local=use_local,
+                    namespaces=entry_namespaces,
+                )
+            except _UncacheableResponse:
+                return computed['response']
+
+            etag = None
+            if (conditional and request is not None
+                    and (user_generation or not overlaid)):
+                # Версия - сама запись: время её вычисления или, если
+                # оно не хранится, хэш содержимого.
+                version = computed_at or _content_hash(data)
+                etag_parts = [cache_key,
+                              getattr(request, 'accepted_media_type', ''),
+                              version]
+                if user_generation:
+                    etag_parts += user_generation
+                etag = _make_etag(*etag_parts)
+                if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+                if if_none_match and _etag_matches(if_none_match, etag):
+                    return _not_modified(etag, None)
+
+            # Персональные флаги меняются без пересчёта общей записи,
+            # поэтому её время для них не подходит.
+            last_modified = None
+            if conditional and computed_at and not overlaid:
+                last_modified = int(computed_at)
+                if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+                if (if_modified_since
+                        and 'HTTP_IF_NONE_MATCH' not in request.META):
+                    from django.utils.http import parse_http_date_safe
+                    since = parse_http_date_safe(if_modified_since)
+                    if since is not None and last_modified <= since:
+                        return _not_modified(etag, last_modified)
+
+            if 'response' in computed:
+                response = finish(computed['response'])
+            else:
                 from rest_framework.response import Response
-                return Response(cached_data)
-            
-            print(f"→ Кэш промах, выполняем запрос: {cache_key}")
-            response = func(*args, **kwargs)
-            
-            if hasattr(response, 'data') and hasattr(response, 'status_code'):
-                if 200 <= response.status_code < 300:
-                    cache.set(cache_key, response.data, ttl)
-            
+                response = finish(Response(data))
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                from django.utils.http import http_date
+                response['Last-Modified'] = http_date(last_modified)
             return response
-        
+
         return wrapper
     return decorator
 
 
 class CacheInvalidationMixin:
-    cache_key_patterns = []
-    
-    def invalidate_cache(self, patterns: Optional[list] = None):
-        cache = get_cache_manager()
-        if not cache:
-            return
-        
-        patterns_to_delete = patterns or self.cache_key_patterns
-        
-        for pattern in patterns_to_delete:
-            deleted_count = cache.delete_pattern(pattern)
-            if deleted_count > 0:
-                print(f"✓ Инвалидировано кэш-ключей: {deleted_count} (паттерн: {pattern})")
-    
+    cache_namespaces = []
+
+    def invalidate_cache(self, namespaces: Optional[list] = None):
+        """
+        Сбросить пространства имён после коммита текущей транзакции:
+        иначе параллельный запрос успеет закэшировать ещё старые данные
+        под новым поколением. Вне транзакции - сразу.
+        """
+        namespaces_to_bump = list(namespaces or self.cache_namespaces)
+
+        def bump():
+            cache = get_cache_manager()
+            if cache and cache.bump_generations(*namespaces_to_bump):
+                logger.debug("Кэш инвалидирован: %s",
+                             ', '.join(namespaces_to_bump))
+
+        transaction.on_commit(bump)
+
     def perform_create(self, serializer):
         result = super().perform_create(serializer)
         self.invalidate_cache()
         return result
-    
+
     def perform_update(self, serializer):
         result = super().perform_update(serializer)
         self.invalidate_cache()
         return result
-    
+
     def perform_destroy(self, instance):
         result = super().perform_destroy(instance)
         self.invalidate_cache()
@@ -0,0 +1,184 @@
+"""Prometheus-метрики слоя кэша"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+try:
+    from prometheus_client import (
+        REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    Counter = None
+
+ENABLED = Counter is not None
+
+_state_collector = None
+
+if ENABLED:
+    CACHE_HITS = Counter(
+        'foodgram_cache_hits_total',
+        'Попадания в кэш',
+        ['prefix', 'tier'],
+    )
+    CACHE_MISSES = Counter(
+        'foodgram_cache_misses_total',
+        'Промахи кэша',
+        ['prefix', 'tier'],
+    )
+    CACHE_STALE = Counter(
+        'foodgram_cache_stale_total',
+        'Отданные устаревшие значения, пока идёт пересчёт',
+        ['prefix'],
+    )
+    CACHE_SETS = Counter(
+        'foodgram_cache_sets_total',
+        'Записи в кэш',
+        ['prefix'],
+    )
+    CACHE_INVALIDATIONS = Counter(
+        'foodgram_cache_invalidations_total',
+        'Инвалидации пространств имён (INCR поколения)',
+        ['namespace'],
+    )
+    CACHE_ERRORS = Counter(
+        'foodgram_cache_errors_total',
+        'Ошибки операций с Redis',
+        ['operation'],
+    )
+    CACHE_VALUE_SIZE = Histogram(
+        'foodgram_cache_value_size_bytes',
+        'Размер закодированного значения',
+        ['prefix'],
+        buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    )
+    CACHE_COMPUTE_SECONDS = Histogram(
+        'foodgram_cache_compute_seconds',
+        'Время вычисления значения при промахе',
+        ['prefix'],
+    )
+    REDIS_LATENCY = Histogram(
+        'foodgram_cache_redis_latency_seconds',
+        'Задержка команд Redis',
+        ['operation'],
+        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 0.5, 1.0),
+    )
+
+
+def key_prefix(key: str) -> str:
+    """recipes:list:<hash> -> recipes:list"""
+    return key.rsplit(':', 1)[0] if ':' in key else key
+
+
+def namespace_label(namespace: str) -> str:
+    """user:42 -> user, чтобы не плодить временные ряды"""
+    return namespace.split(':', 1)[0]
+
+
+def record_hit(key: str, tier: str) -> None:
+    if ENABLED:
+        CACHE_HITS.labels(key_prefix(key), tier).inc()
+
+
+def record_miss(key: str, tier: str) -> None:
+    if ENABLED:
+        CACHE_MISSES.labels(key_prefix(key), tier).inc()
+
+
+def record_stale(key: str) -> None:
+    if ENABLED:
+        CACHE_STALE.labels(key_prefix(key)).inc()
+
+
+def record_set(key: str, size: int) -> None:
+    if ENABLED:
+        prefix = key_prefix(key)
+        CACHE_SETS.labels(prefix).inc()
+        CACHE_VALUE_SIZE.labels(prefix).observe(size)
+
+
+def record_compute(key: str, seconds: float) -> None:
+    if ENABLED:
+        CACHE_COMPUTE_SECONDS.labels(key_prefix(key)).observe(seconds)
+
+
+def record_invalidation(namespaces: Iterable[str]) -> None:
+    if ENABLED:
+        for namespace in namespaces:
+            CACHE_INVALIDATIONS.labels(namespace_label(namespace)).inc()
+
+
+def record_error(operation: str) -> None:
+    if ENABLED:
+        CACHE_ERRORS.labels(operation).inc()
+
+
+@contextmanager
+def redis_timer(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            REDIS_LATENCY.labels(operation).observe(
+                time.perf_counter() - started
+            )
+
+
+class CacheStateCollector:
+    """
+    Текущее состояние пула соединений и L1 процесса на момент сбора.
+
+    В multiprocess-режиме gunicorn отдаёт состояние только того
+    worker-а, который обслужил запрос /metrics.
+    """
+
+    def __init__(self, get_stats: Callable[[], Optional[Dict]]):
+        self.get_stats = get_stats
+
+    def collect(self):
+        stats = self.get_stats()
+        if not stats:
+            return
+
+        pool = GaugeMetricFamily(
+            'foodgram_cache_redis_pool_connections',
+            'Соединения пула Redis',
+            labels=['state'],
+        )
+        for state in ('created', 'in_use', 'waiting', 'max_connections'):
+            pool.add_metric([state], stats['pool'][state])
+        yield pool
+
+        if stats['l1']:
+            l1 = GaugeMetricFamily(
+                'foodgram_cache_l1',
+                'Состояние L1-кэша процесса',
+                labels=['field'],
+            )
+            for field in ('entries', 'bytes', 'max_bytes'):
+                l1.add_metric([field], stats['l1'][field])
+            yield l1
+
+
+def get_registry(get_stats: Callable[[], Optional[Dict]]):
+    """
+    Реестр для отдачи на /metrics.
+
+    При PROMETHEUS_MULTIPROC_DIR (gunicorn с несколькими worker-ами)
+    счётчики собираются из файлов всех процессов в новом реестре.
+    """
+    global _state_collector
+    if not ENABLED:
+        return None
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(CacheStateCollector(get_stats))
+        return registry
+    if _state_collector is None:
+        _state_collector = CacheStateCollector(get_stats)
+        REGISTRY.register(_state_collector)
+    return REGISTRY
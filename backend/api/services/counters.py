@@ -0,0 +1,78 @@
+"""
+Денормализованные счётчики рецептов и пользователей.
+
+Меняются F()-обновлением в той же транзакции, что и запись
+Favorite / ShoppingCart / Subscription / Recipe, поэтому
+конкурирующие запросы не теряют инкременты. Расхождения
+(каскадные удаления, правки в обход API) чинит reconcile().
+"""
+from typing import Dict, Iterable
+
+from django.db import transaction
+from django.db.models import (
+    Count, F, IntegerField, OuterRef, Subquery, Value,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscription
+
+# (модель, поле счётчика, источник, FK источника на модель)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Subscription, 'author'),
+)
+
+
+def increment(model, pk: int, **deltas: int) -> None:
+    """increment(Recipe, 5, favorites_count=1) - одним UPDATE"""
+    increment_many(model, [pk], **deltas)
+
+
+def increment_many(model, pks: Iterable[int], **deltas: int) -> None:
+    model.objects.filter(pk__in=pks).update(**{
+        field: Greatest(F(field) + delta, Value(0),
+                        output_field=IntegerField())
+        for field, delta in deltas.items()
+    })
+
+
+def _actual(source, fk: str):
+    return Coalesce(
+        Subquery(
+            source.objects
+            .filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def reconcile(dry_run: bool = False) -> Dict[str, int]:
+    """
+    Пересчитать счётчики по исходным таблицам.
+
+    Возвращает число исправленных строк для каждого счётчика.
+    """
+    fixed = {}
+    for model, field, source, fk in COUNTERS:
+        label = f'{model._meta.model_name}.{field}'
+        with transaction.atomic():
+            drifted = list(
+                model.objects
+                .annotate(actual=_actual(source, fk))
+                .exclude(**{field: F('actual')})
+                .values_list('pk', flat=True)
+            )
+            fixed[label] = len(drifted)
+            if drifted and not dry_run:
+                model.objects.filter(pk__in=drifted).update(
+                    **{field: _actual(source, fk)}
+                )
+    return fixed
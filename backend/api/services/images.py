@@ -0,0 +1,158 @@
+"""
+WebP-варианты загруженных изображений (рецепты, аватары).
+
+Запрос только сохраняет оригинал; варианты thumb/card/full строит
+задача Celery (celery_tasks.images) после коммита. Имена файлов
+лежат в поле <field>_variants вместе с именем оригинала (source):
+если оригинал с тех пор заменили, варианты считаются устаревшими
+и отдаётся оригинал.
+"""
+import io
+import logging
+import os
+import posixpath
+from typing import Dict, Iterable, Optional
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Вариант -> (ширина, высота, обрезать до точного размера)
+VARIANTS = {
+    'thumb': (200, 200, True),
+    'card': (600, 600, False),
+    'full': (1600, 1600, False),
+}
+WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+
+
+def variants_field(field: str) -> str:
+    return f'{field}_variants'
+
+
+def variant_name(source: str, variant: str) -> str:
+    """recipes/abc.png -> recipes/variants/abc_thumb.webp"""
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}_{variant}.webp')
+
+
+def variant_url(instance, field: str, variant: str) -> Optional[str]:
+    """URL варианта, пока его нет - оригинала; None без изображения"""
+    image = getattr(instance, field)
+    if not image:
+        return None
+    variants = getattr(instance, variants_field(field)) or {}
+    if variants.get('source') == image.name and variant in variants:
+        return image.storage.url(variants[variant])
+    return image.url
+
+
+def schedule_variants(instance, field: str,
+                      namespaces: Iterable[str] = ()) -> None:
+    """
+    Построить варианты после коммита текущей транзакции.
+
+    namespaces - пространства кэша, которые надо сбросить, когда
+    варианты готовы (в закэшированных ответах ещё оригинал).
+    """
+    from celery_tasks.images import make_image_variants
+
+    args = (instance._meta.label_lower, instance.pk, field, list(namespaces))
+
+    def send():
+        try:
+            make_image_variants.apply_async(args, retry=False)
+        except Exception as e:
+            # Без вариантов сериализаторы отдают оригинал
+            logger.warning('Не удалось поставить задачу вариантов %s: %s',
+                           args[:3], e)
+
+    transaction.on_commit(send)
+
+
+def _open(image) -> Image.Image:
+    with image.open('rb') as file:
+        picture = Image.open(file)
+        # Поворот из EXIF применяется к пикселям: метаданные не копируются
+        picture = ImageOps.exif_transpose(picture)
+        if picture.mode not in ('RGB', 'RGBA'):
+            has_alpha = ('A' in picture.getbands()
+                         or 'transparency' in picture.info)
+            picture = picture.convert('RGBA' if has_alpha else 'RGB')
+        picture.load()
+    return picture
+
+
+def _render(picture: Image.Image, width: int, height: int,
+            crop: bool) -> bytes:
+    if crop:
+        result = ImageOps.fit(picture, (width, height),
+                              Image.Resampling.LANCZOS)
+    else:
+        result = picture.copy()
+        result.thumbnail((width, height), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    # Без exif/icc_profile в параметрах WebP сохраняется без метаданных
+    result.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def delete_variants(variants: Dict[str, str], storage,
+                    keep: Iterable[str] = ()) -> None:
+    keep = set(keep)
+    for variant, name in variants.items():
+        if variant != 'source' and name not in keep:
+            storage.delete(name)
+
+
+def discard_variants(instance, field: str) -> None:
+    """Удалить файлы вариантов (перед удалением оригинала)"""
+    vfield = variants_field(field)
+    queryset = type(instance).objects.filter(pk=instance.pk)
+    # Из БД: задача могла записать варианты после загрузки instance
+    variants = queryset.values_list(vfield, flat=True).first() or {}
+    if variants:
+        delete_variants(variants, getattr(instance, field).storage)
+        queryset.update(**{vfield: {}})
+    setattr(instance, vfield, {})
+
+
+def make_variants(model, pk: int, field: str) -> Dict[str, str]:
+    """
+    Построить и записать варианты изображения field объекта pk.
+
+    Запись условная (изображение всё ещё то же), поэтому гонка
+    с новой загрузкой не оставит чужие варианты.
+    """
+    vfield = variants_field(field)
+    instance = model.objects.filter(pk=pk).only('pk', field, vfield).first()
+    image = getattr(instance, field, None)
+    if not image:
+        return {}
+
+    source = image.name
+    picture = _open(image)
+    storage = image.storage
+    variants = {'source': source}
+    for variant, (width, height, crop) in VARIANTS.items():
+        name = variant_name(source, variant)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[variant] = storage.save(
+            name, ContentFile(_render(picture, width, height, crop))
+        )
+
+    updated = (
+        model.objects
+        .filter(pk=pk, **{field: source})
+        .update(**{vfield: variants})
+    )
+    if not updated:
+        delete_variants(variants, storage)
+        return {}
+    previous = getattr(instance, vfield) or {}
+    delete_variants(previous, storage, keep=variants.values())
+    return variants
@@ -0,0 +1,129 @@
+"""
+Поиск ингредиентов по префиксу в памяти процесса.
+
+Каталог небольшой и меняется редко, поэтому индекс строится одним
+запросом и живёт в worker-е. Он пересобирается, когда меняется
+поколение пространства имён 'ingredients' (правки Ingredient, см.
+api.signals), и не реже раза в INGREDIENT_INDEX_TTL секунд, чтобы
+подтянуть популярность из IngredientInRecipe.
+"""
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.db.models import Count
+
+from api.services.cache_manager import get_cache_manager
+from recipes.models import Ingredient
+
+INDEX_NAMESPACE = 'ingredients'
+INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 600))
+SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 20))
+
+# Набор в английской раскладке вместо русской: "cf[fh" -> "сахар"
+_LAYOUT = str.maketrans(
+    'qwertyuiop[]asdfghjkl;\'zxcvbnm,.`',
+    'йцукенгшщзхъфывапролджэячсмитьбюё',
+)
+_PREFIX_END = '\U0010ffff'
+
+# (id, name, measurement_unit, использований в рецептах)
+IngredientRow = Tuple[int, str, str, int]
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def swap_layout(text: str) -> str:
+    return text.casefold().translate(_LAYOUT)
+
+
+class IngredientIndex:
+    """Отсортированные нормализованные названия + ранг популярности"""
+
+    def __init__(self, rows: Sequence[IngredientRow]):
+        by_usage = sorted(rows, key=lambda row: (-row[3], row[1]))
+        entries = sorted(
+            (normalize(name), rank, {
+                'id': pk, 'name': name, 'measurement_unit': unit,
+            })
+            for rank, (pk, name, unit, _) in enumerate(by_usage)
+        )
+        self._keys = [key for key, _, _ in entries]
+        self._ranks = [rank for _, rank, _ in entries]
+        self._items = [item for _, _, item in entries]
+        self._all = [item for _, _, item in sorted(
+            entries, key=lambda entry: (entry[0], entry[2]['name'])
+        )]
+
+    def __len__(self):
+        return len(self._items)
+
+    def all(self) -> List[Dict]:
+        return self._all
+
+    def _prefix_top(self, prefix: str, limit: int) -> List[int]:
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + _PREFIX_END, lo)
+        return heapq.nsmallest(limit, range(lo, hi),
+                               key=self._ranks.__getitem__)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        """До limit самых используемых ингредиентов, начинающихся с query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        positions = self._prefix_top(prefix, limit)
+        if len(positions) < limit:
+            swapped = normalize(swap_layout(query))
+            if swapped != prefix:
+                positions = heapq.nsmallest(
+                    limit,
+                    set(positions) | set(self._prefix_top(swapped, limit)),
+                    key=self._ranks.__getitem__,
+                )
+        return [self._items[position] for position in positions]
+
+
+def _load_rows() -> List[IngredientRow]:
+    return list(
+        Ingredient.objects
+        .annotate(usage=Count('used_in'))
+        .values_list('id', 'name', 'measurement_unit', 'usage')
+        .order_by()
+    )
+
+
+_index: Optional[IngredientIndex] = None
+_index_generation: Optional[int] = None
+_index_expires_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _current_generation() -> Optional[int]:
+    cache = get_cache_manager()
+    if not cache:
+        return None
+    # Из L1: пока поколение не сброшено pub/sub, Redis не нужен
+    generations = cache.get_generations([INDEX_NAMESPACE], local=True)
+    return generations[INDEX_NAMESPACE] if generations else None
+
+
+def get_index() -> IngredientIndex:
+    global _index, _index_generation, _index_expires_at
+    generation = _current_generation()
+    if (_index is not None and generation == _index_generation
+            and time.monotonic() < _index_expires_at):
+        return _index
+
+    with _index_lock:
+        if (_index is None or generation != _index_generation
+                or time.monotonic() >= _index_expires_at):
+            _index = IngredientIndex(_load_rows())
+            _index_generation = generation
+            _index_expires_at = time.monotonic() + INDEX_TTL
+        return _index
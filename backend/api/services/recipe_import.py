@@ -0,0 +1,143 @@
+"""Массовый импорт рецептов (POST /api/recipes/import/)"""
+import logging
+import os
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ParseError
+
+from api.serializers.recipes import RecipeImportSerializer
+from api.services import counters, images
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Рецептов в одной транзакции / одном bulk_create
+CHUNK_SIZE = int(os.getenv('RECIPE_IMPORT_CHUNK_SIZE', 500))
+# Импорт идёт в запросе и должен уложиться в timeout gunicorn (120 с);
+# тот же предел тела - client_max_body_size в infra/nginx.conf
+MAX_ITEMS = int(os.getenv('RECIPE_IMPORT_MAX_ITEMS', 2000))
+MAX_BYTES = int(os.getenv('RECIPE_IMPORT_MAX_BYTES', 32 * 1024 * 1024))
+
+
+def _error(index: int, errors) -> Dict:
+    return {'index': index, 'status': 'error', 'errors': errors}
+
+
+def _validate(index: int, item):
+    """(validated_data, None) или (None, результат с ошибкой)"""
+    if isinstance(item, ParseError):
+        return None, _error(index, {'non_field_errors': [item.detail]})
+    if not isinstance(item, dict):
+        return None, _error(
+            index, {'non_field_errors': ['Ожидается объект рецепта.']}
+        )
+    serializer = RecipeImportSerializer(data=item)
+    if not serializer.is_valid():
+        return None, _error(index, serializer.errors)
+    return serializer.validated_data, None
+
+
+def _import_chunk(author, chunk: List, start: int) -> List[Dict]:
+    results = {}
+    valid = []
+    for index, item in enumerate(chunk, start):
+        data, error = _validate(index, item)
+        if error:
+            results[index] = error
+        else:
+            valid.append((index, data))
+
+    # Ингредиенты всей пачки - одним запросом
+    requested = {item['id'] for _, data in valid
+                 for item in data['ingredients']}
+    existing = set(
+        Ingredient.objects
+        .filter(id__in=requested)
+        .values_list('id', flat=True)
+    )
+    ready = []
+    for index, data in valid:
+        missing = {item['id'] for item in data['ingredients']} - existing
+        if missing:
+            message = RecipeImportSerializer.missing_ingredients_message(
+                missing
+            )
+            results[index] = _error(index, {'ingredients': [message]})
+        else:
+            ready.append((index, data))
+
+    if ready:
+        try:
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create([
+                    Recipe(author=author, name=data['name'],
+                           text=data['text'], image=data['image'],
+                           cooking_time=data['cooking_time'])
+                    for _, data in ready
+                ])
+                IngredientInRecipe.objects.bulk_create([
+                    IngredientInRecipe(recipe=recipe,
+                                       ingredient_id=item['id'],
+                                       amount=item['amount'])
+                    for recipe, (_, data) in zip(recipes, ready)
+                    for item in data['ingredients']
+                ])
+                counters.increment(CustomUser, author.id,
+                                   recipes_count=len(recipes))
+                for recipe in recipes:
+                    images.schedule_variants(
+                        recipe, 'image', ['recipes', f'recipe:{recipe.pk}']
+                    )
+        except DatabaseError as exc:
+            logger.exception('Ошибка сохранения пачки импорта')
+            for index, _ in ready:
+                results[index] = _error(
+                    index,
+                    {'non_field_errors': [f'Не удалось сохранить: {exc}']},
+                )
+        else:
+            for recipe, (index, _) in zip(recipes, ready):
+                results[index] = {'index': index, 'status': 'created',
+                                  'id': recipe.id}
+
+    return [results[index] for index in sorted(results)]
+
+
+def import_recipes(author, items: Iterable,
+                   chunk_size: int = CHUNK_SIZE,
+                   max_items: int = MAX_ITEMS,
+                   after_chunk: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Создать рецепты автора из items (список или генератор NDJSON)
+    пачками по chunk_size, каждая в своей транзакции.
+
+    Ошибки валидации не мешают остальным элементам; результат
+    по каждому элементу - в порядке входных данных. Элементы сверх
+    max_items не импортируются и получают ошибку. after_chunk
+    вызывается после каждой пачки, где что-то создано (сброс кэша).
+    """
+    results = []
+    items = iter(items)
+    while len(results) < max_items:
+        size = min(chunk_size, max_items - len(results))
+        chunk = list(islice(items, size))
+        if not chunk:
+            break
+        chunk_results = _import_chunk(author, chunk, len(results))
+        results.extend(chunk_results)
+        if after_chunk and any(result['status'] == 'created'
+                               for result in chunk_results):
+            after_chunk()
+    for index, _ in enumerate(items, len(results)):
+        results.append(_error(index, {'non_field_errors': [
+            f'Не больше {max_items} рецептов за запрос.'
+        ]}))
+    created = sum(result['status'] == 'created' for result in results)
+    return {
+        'created': created,
+        'failed': len(results) - created,
+        'results': results,
+    }
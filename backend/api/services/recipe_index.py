@@ -0,0 +1,206 @@
+"""
+Инвертированный индекс ингредиент -> рецепты для подбора "что
+приготовить из того, что есть".
+
+Индекс живёт в памяти worker-а: по каждому ингредиенту - отсортированный
+array id рецептов, по каждому рецепту - число ингредиентов. Он
+пересобирается одним запросом, как только меняется поколение
+INDEX_NAMESPACE. Его вместе с 'recipes' сбрасывают только создание,
+правка, удаление и импорт рецептов и удаление ингредиентов, а не
+профили и изображения, так что индекс новее ответа, закэшированного
+под тем же поколением 'recipes'. Без Redis поколения нет, и индекс
+пересобирается не чаще раза в RECIPE_INDEX_MIN_REBUILD секунд.
+"""
+import heapq
+import os
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db.models import Count, FloatField, Q
+from django.db.models.functions import Cast
+
+from api.services.cache_manager import get_cache_manager
+from recipes.models import IngredientInRecipe, Recipe
+
+INDEX_NAMESPACE = 'recipe_ingredients'
+MIN_REBUILD_INTERVAL = int(os.getenv('RECIPE_INDEX_MIN_REBUILD', 30))
+MAX_RESULTS = 200
+FILTER_BATCH = 1000
+DEFAULT_MIN_COVERAGE = 1.0
+
+# (id рецепта, доля его ингредиентов из переданных, сколько совпало)
+CoverageRow = Tuple[int, float, int]
+
+
+def _rank(row: CoverageRow):
+    recipe_id, share, matched = row
+    return share, matched, recipe_id
+
+
+class RecipeIngredientIndex:
+    def __init__(self, pairs: Iterable[Tuple[int, int]]):
+        postings = defaultdict(list)
+        sizes = Counter()
+        for ingredient_id, recipe_id in pairs:
+            postings[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        self._postings: Dict[int, array] = {
+            ingredient_id: array('I', sorted(recipe_ids))
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self._sizes: Dict[int, int] = dict(sizes)
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def coverage(self, ingredient_ids: Iterable[int],
+                 min_coverage: float = DEFAULT_MIN_COVERAGE,
+                 limit: Optional[int] = MAX_RESULTS) -> List[CoverageRow]:
+        """
+        Рецепты, у которых не меньше min_coverage ингредиентов есть среди
+        ingredient_ids: сначала полнее покрытые, затем более новые.
+        limit=None - все такие рецепты.
+        """
+        counts = Counter()
+        for ingredient_id in set(ingredient_ids):
+            recipe_ids = self._postings.get(ingredient_id)
+            if recipe_ids is not None:
+                # Подсчёт по всему списку рецептов идёт в C (Counter)
+                counts.update(recipe_ids)
+
+        sizes = self._sizes
+        rows = [
+            (recipe_id, matched / sizes[recipe_id], matched)
+            for recipe_id, matched in counts.items()
+            if matched >= min_coverage * sizes[recipe_id]
+        ]
+        if limit is None:
+            return sorted(rows, key=_rank, reverse=True)
+        return heapq.nlargest(limit, rows, key=_rank)
+
+
+def naive_coverage(ingredient_ids: Iterable[int],
+                   min_coverage: float = DEFAULT_MIN_COVERAGE,
+                   limit: int = MAX_RESULTS) -> List[CoverageRow]:
+    """То же через GROUP BY/HAVING в БД (для сравнения в бенчмарке)"""
+    ingredient_ids = list(set(ingredient_ids))
+    rows = (
+        Recipe.objects
+        .annotate(
+            matched=Count('ingredient_amounts',
+                          filter=Q(ingredient_amounts__ingredient_id__in=(
+                              ingredient_ids
+                          ))),
+            size=Count('ingredient_amounts'),
+        )
+        .filter(matched__gt=0)
+        .annotate(share=Cast('matched', FloatField())
+                  / Cast('size', FloatField()))
+        .filter(share__gte=min_coverage)
+        .order_by('-share', '-matched', '-id')
+        .values_list('id', 'share', 'matched')[:limit]
+    )
+    return list(rows)
+
+
+class RankedRecipes:
+    """
+    Рецепты queryset в порядке индекса - список для пагинатора.
+
+    Порядок не пересчитывается в SQL: count - длина отбора, страница
+    вырезается из готового порядка и загружается по id. Если на queryset
+    есть и другие фильтры, отбор один раз пересекается с ним простым
+    pk IN пачками по FILTER_BATCH id.
+    """
+    ordered = True
+
+    def __init__(self, queryset, ranked_ids: Sequence[int]):
+        self.queryset = queryset
+        self._ranked_ids = ranked_ids
+        self._ids: Optional[List[int]] = None
+
+    @property
+    def ids(self) -> List[int]:
+        if self._ids is None:
+            if not self.queryset.query.has_filters():
+                self._ids = list(self._ranked_ids)
+            else:
+                allowed = set()
+                base = self.queryset.prefetch_related(None).order_by()
+                for start in range(0, len(self._ranked_ids), FILTER_BATCH):
+                    batch = self._ranked_ids[start:start + FILTER_BATCH]
+                    allowed.update(base.filter(pk__in=batch)
+                                   .values_list('pk', flat=True))
+                self._ids = [pk for pk in self._ranked_ids if pk in allowed]
+        return self._ids
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self._fetch(self.ids[item])
+        return self._fetch([self.ids[item]])[0]
+
+    def __iter__(self):
+        return iter(self._fetch(self.ids))
+
+    def get(self, **kwargs):
+        return self.queryset.filter(pk__in=self.ids).get(**kwargs)
+
+    def _fetch(self, ids: Sequence[int]) -> List:
+        position = {pk: i for i, pk in enumerate(ids)}
+        recipes = self.queryset.filter(pk__in=ids).order_by()
+        return sorted(recipes, key=lambda recipe: position[recipe.pk])
+
+
+def _load_pairs() -> List[Tuple[int, int]]:
+    return list(
+        IngredientInRecipe.objects
+        .values_list('ingredient_id', 'recipe_id')
+        .order_by()
+    )
+
+
+_index: Optional[RecipeIngredientIndex] = None
+_index_generation: Optional[int] = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def _current_generation() -> Optional[int]:
+    cache = get_cache_manager()
+    if not cache:
+        return None
+    # Из Redis, а не L1: сбрасывается одним запросом с 'recipes'
+    generations = cache.get_generations([INDEX_NAMESPACE])
+    return generations[INDEX_NAMESPACE] if generations else None
+
+
+def _is_fresh(generation: Optional[int]) -> bool:
+    if _index is None:
+        return False
+    if generation is not None:
+        return generation == _index_generation
+    # Без Redis поколения нет - пересборка просто по времени
+    return time.monotonic() - _index_built_at < MIN_REBUILD_INTERVAL
+
+
+def get_index() -> RecipeIngredientIndex:
+    global _index, _index_generation, _index_built_at
+    generation = _current_generation()
+    if _is_fresh(generation):
+        return _index
+
+    with _index_lock:
+        if not _is_fresh(generation):
+            _index = RecipeIngredientIndex(_load_pairs())
+            _index_generation = generation
+            _index_built_at = time.monotonic()
+        return _index
@@ -0,0 +1,234 @@
+"""
+Список покупок: суммы ингредиентов корзины и выгрузка потоком.
+
+Суммы хранятся в ShoppingListItem и меняются приращениями при
+добавлении и удалении рецепта из корзины. Правка ингредиентов рецепта
+или его удаление пересчитывают затронутые позиции у всех, у кого он в
+корзине; check_shopping_lists пересобирает разошедшиеся списки.
+"""
+import csv
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+from users.models import CustomUser
+
+# (название, единица измерения, количество)
+ShoppingListRow = Tuple[str, str, int]
+
+FORMATS = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'json': 'application/json',
+}
+
+ITERATOR_CHUNK_SIZE = 500
+CHECK_BATCH_SIZE = 500
+
+
+def get_shopping_list(user) -> Iterator[ShoppingListRow]:
+    """Готовые суммы ингредиентов корзины, без агрегации"""
+    return (
+        ShoppingListItem.objects
+        .filter(user=user)
+        .values_list('ingredient__name', 'ingredient__measurement_unit',
+                     'amount')
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+
+
+def _lock_users(user_ids: Iterable[int]) -> None:
+    """Сериализовать изменения списков этих пользователей до коммита"""
+    list(
+        CustomUser.objects
+        .select_for_update()
+        .filter(pk__in=user_ids)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+@transaction.atomic
+def _apply_recipes(user_id: int, recipe_ids: Iterable[int],
+                   sign: int) -> None:
+    amounts = dict(
+        IngredientInRecipe.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    if not amounts:
+        return
+
+    _lock_users([user_id])
+    items = {
+        item.ingredient_id: item
+        for item in ShoppingListItem.objects.filter(
+            user_id=user_id, ingredient_id__in=amounts
+        )
+    }
+    changed, created, emptied = [], [], []
+    for ingredient_id, amount in amounts.items():
+        item = items.get(ingredient_id)
+        if item is None:
+            if sign > 0:
+                created.append(ShoppingListItem(user_id=user_id,
+                                                ingredient_id=ingredient_id,
+                                                amount=amount))
+            continue
+        item.amount += sign * amount
+        (changed if item.amount > 0 else emptied).append(item)
+
+    ShoppingListItem.objects.bulk_update(changed, ['amount'])
+    ShoppingListItem.objects.bulk_create(created)
+    ShoppingListItem.objects.filter(
+        pk__in=[item.pk for item in emptied]
+    ).delete()
+
+
+def add_recipes(user_id: int, recipe_ids: Iterable[int]) -> None:
+    """Рецепты добавлены в корзину: прибавить их ингредиенты"""
+    _apply_recipes(user_id, recipe_ids, 1)
+
+
+def remove_recipes(user_id: int, recipe_ids: Iterable[int]) -> None:
+    """Рецепты убраны из корзины: вычесть их ингредиенты"""
+    _apply_recipes(user_id, recipe_ids, -1)
+
+
+def _expected_totals(user_ids: Iterable[int],
+                     ingredient_ids: Optional[Iterable[int]] = None
+                     ) -> Dict[Tuple[int, int], int]:
+    """Суммы, посчитанные заново по корзинам: {(user_id, ingredient_id)}"""
+    queryset = IngredientInRecipe.objects.filter(
+        recipe__in_shopping_carts__user__in=user_ids
+    )
+    if ingredient_ids is not None:
+        queryset = queryset.filter(ingredient_id__in=ingredient_ids)
+    totals = (
+        queryset
+        .values_list('recipe__in_shopping_carts__user', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in totals
+    }
+
+
+@transaction.atomic
+def rebuild(user_ids: Iterable[int],
+            ingredient_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Пересчитать списки пользователей по корзинам - целиком или только
+    позиции ingredient_ids.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+
+    _lock_users(user_ids)
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    if ingredient_ids is not None:
+        items = items.filter(ingredient_id__in=ingredient_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                         amount=total)
+        for (user_id, ingredient_id), total
+        in _expected_totals(user_ids, ingredient_ids).items()
+    )
+
+
+def cart_user_ids(recipe_id: int) -> List[int]:
+    return list(
+        ShoppingCart.objects
+        .filter(recipe_id=recipe_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def check(batch_size: int = CHECK_BATCH_SIZE) -> List[int]:
+    """
+    Сравнить сохранённые списки с пересчитанными по корзинам и
+    пересобрать разошедшиеся. Возвращает id исправленных пользователей.
+    """
+    user_ids = sorted(
+        set(ShoppingCart.objects.values_list('user_id', flat=True)
+            .distinct())
+        | set(ShoppingListItem.objects.values_list('user_id', flat=True)
+              .distinct())
+    )
+    drifted = []
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        expected = _expected_totals(batch)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects
+            .filter(user_id__in=batch)
+            .values_list('user_id', 'ingredient_id', 'amount')
+        }
+        batch_drifted = sorted({
+            user_id
+            for user_id, ingredient_id in set(expected) | set(stored)
+            if (expected.get((user_id, ingredient_id))
+                != stored.get((user_id, ingredient_id)))
+        })
+        if batch_drifted:
+            rebuild(batch_drifted)
+            drifted.extend(batch_drifted)
+    return drifted
+
+
+class _Echo:
+    """Файл для csv.writer, возвращающий строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def _stream_txt(rows: Iterable[ShoppingListRow]) -> Iterator[str]:
+    yield 'Список покупок:\n'
+    for name, unit, amount in rows:
+        yield f'\n• {name} — {amount} {unit}'
+
+
+def _stream_csv(rows: Iterable[ShoppingListRow]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _stream_json(rows: Iterable[ShoppingListRow]) -> Iterator[str]:
+    yield '['
+    separator = ''
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False,
+        )
+        separator = ','
+    yield ']'
+
+
+_STREAMS = {
+    'txt': _stream_txt,
+    'csv': _stream_csv,
+    'json': _stream_json,
+}
+
+
+def stream_shopping_list(rows: Iterable[ShoppingListRow],
+                         fmt: str) -> Iterator[str]:
+    return _STREAMS[fmt](rows)
@@ -0,0 +1,111 @@
+"""
+Загрузка изображений файлом (multipart или бинарное тело) вместо base64.
+
+Тело пишется во временный файл кусками, размер проверяется по ходу
+чтения, размеры в пикселях - по заголовку до декодирования. Готовый
+файл переносится в хранилище (FileSystemStorage делает rename), так
+что память на загрузку не зависит от размера изображения.
+"""
+import os
+import uuid
+
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+MAX_PIXELS = int(os.getenv('IMAGE_UPLOAD_MAX_PIXELS', 40_000_000))
+# Заголовки частей multipart сверх самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Формат Pillow -> расширение файла в хранилище
+FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'WEBP': 'webp',
+    'GIF': 'gif',
+}
+
+FILE_CONTENT_TYPES = ('multipart/form-data', 'image/')
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = (f'Файл больше {MAX_BYTES // (1024 * 1024)} МБ.')
+    default_code = 'upload_too_large'
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Сразу на диск; обрывает чтение, как только превышен MAX_BYTES"""
+    chunk_size = 64 * 1024
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > MAX_BYTES:
+            self.file.close()
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def is_file_upload(request) -> bool:
+    return request.content_type.startswith(FILE_CONTENT_TYPES)
+
+
+def prepare(request) -> None:
+    """Вызывать до первого обращения к request.data"""
+    length = request.META.get('CONTENT_LENGTH') or ''
+    if length.isdigit() and int(length) > MAX_BYTES + MULTIPART_OVERHEAD:
+        raise UploadTooLarge()
+    request._request.upload_handlers = [
+        LimitedUploadHandler(request._request)
+    ]
+
+
+def get_upload(request, field: str):
+    """Файл из части field (multipart) или из тела (image/*)"""
+    upload = request.FILES.get(field) or request.FILES.get('file')
+    if upload is None:
+        raise serializers.ValidationError(
+            {field: 'Файл не передан.'}
+        )
+    return upload
+
+
+def storage_name(upload, field: str) -> str:
+    """
+    Проверить формат и размеры по заголовку изображения, не декодируя
+    пиксели; вернуть имя файла для хранилища.
+    """
+    try:
+        with Image.open(upload) as picture:
+            image_format = picture.format
+            width, height = picture.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise serializers.ValidationError(
+            {field: 'Файл не является изображением.'}
+        )
+    if image_format not in FORMATS:
+        raise serializers.ValidationError(
+            {field: 'Поддерживаются JPEG, PNG, WEBP и GIF.'}
+        )
+    if width * height > MAX_PIXELS:
+        raise serializers.ValidationError(
+            {field: f'Изображение больше {MAX_PIXELS} пикселей.'}
+        )
+    upload.seek(0)
+    return f'{uuid.uuid4()}.{FORMATS[image_format]}'
+
+
+def attach(instance, field: str, upload) -> None:
+    """Сохранить загруженный файл в поле field объекта (только это поле)"""
+    try:
+        name = storage_name(upload, field)
+        getattr(instance, field).save(name, upload, save=False)
+    finally:
+        upload.close()
+    instance.save(update_fields=[field])
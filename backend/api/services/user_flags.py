@@ -0,0 +1,95 @@
+"""Персональные флаги поверх общих (закэшированных) ответов"""
+from typing import Any, Dict, Iterable, Set
+
+from django.db.models import IntegerField, Value
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+FAVORITED = 1
+IN_SHOPPING_CART = 2
+SUBSCRIBED = 3
+
+
+def get_user_flags(user, recipe_ids: Iterable[int] = (),
+                   author_ids: Iterable[int] = ()) -> Dict[int, Set[int]]:
+    """
+    Избранное, корзина и подписки пользователя одним запросом (UNION ALL),
+    только для переданных рецептов и авторов.
+    """
+    flags = {FAVORITED: set(), IN_SHOPPING_CART: set(), SUBSCRIBED: set()}
+    recipe_ids = list(recipe_ids)
+    author_ids = list(author_ids)
+    if not user.is_authenticated or not (recipe_ids or author_ids):
+        return flags
+
+    def kind(value):
+        return Value(value, output_field=IntegerField())
+
+    favorites = (
+        Favorite.objects
+        .filter(user=user, recipe_id__in=recipe_ids)
+        .annotate(kind=kind(FAVORITED))
+        .values_list('kind', 'recipe_id')
+        .order_by()
+    )
+    cart = (
+        ShoppingCart.objects
+        .filter(user=user, recipe_id__in=recipe_ids)
+        .annotate(kind=kind(IN_SHOPPING_CART))
+        .values_list('kind', 'recipe_id')
+        .order_by()
+    )
+    subscriptions = (
+        Subscription.objects
+        .filter(user=user, author_id__in=author_ids)
+        .annotate(kind=kind(SUBSCRIBED))
+        .values_list('kind', 'author_id')
+        .order_by()
+    )
+    for flag, object_id in favorites.union(cart, subscriptions, all=True):
+        flags[flag].add(object_id)
+    return flags
+
+
+def overlay_recipe_flags(request, data: Any) -> Any:
+    """
+    Проставить is_favorited, is_in_shopping_cart и author.is_subscribed
+    в общем ответе списка (с пагинацией или без) или деталей рецепта.
+
+    Исходные данные могут лежать в L1-кэше, поэтому не изменяются:
+    возвращается поверхностная копия.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return data
+
+    if isinstance(data, dict) and 'results' in data:
+        recipes = data['results']
+    elif isinstance(data, list):
+        recipes = data
+    else:
+        recipes = [data]
+
+    flags = get_user_flags(
+        user,
+        recipe_ids={recipe['id'] for recipe in recipes},
+        author_ids={recipe['author']['id'] for recipe in recipes},
+    )
+
+    def overlay(recipe):
+        return {
+            **recipe,
+            'author': {
+                **recipe['author'],
+                'is_subscribed': recipe['author']['id'] in flags[SUBSCRIBED],
+            },
+            'is_favorited': recipe['id'] in flags[FAVORITED],
+            'is_in_shopping_cart': recipe['id'] in flags[IN_SHOPPING_CART],
+        }
+
+    if isinstance(data, dict) and 'results' in data:
+        return {**data, 'results': [overlay(recipe) for recipe in recipes]}
+    if isinstance(data, list):
+        return [overlay(recipe) for recipe in recipes]
+    return overlay(data)
@@ -0,0 +1,30 @@
+"""Инвалидация кэша при изменениях моделей вне view (админка, shell)"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.services import recipe_index
+from api.services.cache_manager import get_cache_manager
+from recipes.models import Ingredient
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    """
+    Сбросить кэш ингредиентов и индекс автодополнения в worker-ах.
+
+    После коммита: админка сохраняет в транзакции, и до коммита другой
+    worker пересобрал бы индекс и каталог из старых данных.
+    """
+    namespaces = ['ingredients']
+    if kwargs['signal'] is post_delete:
+        # Каскадом удалены и строки рецептов: меняются их ответы
+        # и индекс ?have=
+        namespaces += ['recipes', recipe_index.INDEX_NAMESPACE]
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _bump(namespaces):
+    cache = get_cache_manager()
+    if cache:
+        cache.bump_generations(*namespaces)
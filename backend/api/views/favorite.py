@@ -4,7 +4,10 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from recipes.models import Recipe, Favorite
 from api.serializers.favorite import FavoriteSerializer
-from api.services.cache_manager import get_cache_manager
+from api.serializers.recipes import RecipeIdListSerializer
+from api.services.cache_manager import invalidate_user_cache
+from api.services import counters, toggles
+from django.db import transaction
 
 
 class FavoriteMixin:
@@ -13,37 +16,62 @@ class FavoriteMixin:
             permission_classes=[permissions.IsAuthenticated])
     def favorite(self, request, pk=None):
         user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
 
         if request.method == 'POST':
-            if Favorite.objects.filter(user=user, recipe=recipe).exists():
+            with transaction.atomic():
+                added = toggles.add(Favorite, 'recipe', user.id, [pk])
+                counters.increment_many(Recipe, added, favorites_count=1)
+            recipe = get_object_or_404(Recipe.objects.only(
+                'id', 'name', 'image', 'image_variants', 'cooking_time'
+            ), pk=pk)
+            if not added:
                 return Response({'errors': 'Рецепт уже в избранном.'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            Favorite.objects.create(user=user, recipe=recipe)
             serializer = FavoriteSerializer(recipe)
-            
-            try:
-                cache = get_cache_manager()
-                if cache:
-                    cache.delete_pattern(f"recipes:list:*user_id*{user.id}*")
-                    cache.delete_pattern(f"recipes:detail:*")
-            except Exception:
-                pass
-            
+
+            invalidate_user_cache(user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        favorite = Favorite.objects.filter(user=user, recipe=recipe).first()
-        if not favorite:
+        with transaction.atomic():
+            removed = toggles.remove(Favorite, 'recipe', user.id, [pk])
+            counters.increment_many(Recipe, removed, favorites_count=-1)
+        if not removed:
+            get_object_or_404(Recipe, pk=pk)
             return Response({'errors': 'Рецепта не было в избранном.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        favorite.delete()
-        
-        try:
-            cache = get_cache_manager()
-            if cache:
-                cache.delete_pattern(f"recipes:list:*user_id*{user.id}*")
-                cache.delete_pattern(f"recipes:detail:*")
-        except Exception:
-            pass
-        
+
+        invalidate_user_cache(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite',
+            permission_classes=[permissions.IsAuthenticated])
+    def favorite_batch(self, request):
+        """
+        Добавить или убрать сразу несколько рецептов: {"recipes": [id]}.
+        В skipped - несуществующие и уже (не) бывшие в избранном.
+        """
+        serializer = RecipeIdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        user = request.user
+
+        with transaction.atomic():
+            if request.method == 'POST':
+                key, delta = 'added', 1
+                changed = toggles.add(Favorite, 'recipe', user.id,
+                                      recipe_ids)
+            else:
+                key, delta = 'removed', -1
+                changed = toggles.remove(Favorite, 'recipe', user.id,
+                                         recipe_ids)
+            counters.increment_many(Recipe, changed, favorites_count=delta)
+
+        if changed:
+            invalidate_user_cache(user.id)
+        return Response({
+            key: changed,
+            'skipped': sorted(set(recipe_ids) - set(changed)),
+        })
+
@@ -1,10 +1,18 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
 from django_filters.rest_framework import FilterSet, filters, CharFilter
 from recipes.models import Recipe, Ingredient
+from api.services import recipe_index
 
 
 class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_is_in_shopping_cart')
+    search = CharFilter(method='filter_search')
+    # ?have=1,2,3&min_coverage=0.8 - что приготовить из этих ингредиентов
+    have = CharFilter(method='filter_have')
+    min_coverage = filters.NumberFilter(method='filter_min_coverage')
 
     class Meta:
         model = Recipe
@@ -23,6 +31,78 @@ class RecipeFilter(FilterSet):
         return queryset
 
 
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию, лучшие совпадения
+        первыми. В Postgres - tsvector с русской морфологией и GIN-индексом,
+        в остальных БД - icontains по каждому слову.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(value, config='russian',
+                                search_type='websearch')
+            return (
+                queryset
+                .filter(search_vector=query)
+                .annotate(search_rank=SearchRank(F('search_vector'), query))
+                .order_by('-search_rank', '-created_at')
+            )
+
+        # icontains в SQLite не сравнивает кириллицу без учёта регистра,
+        # поэтому слово проверяется и со строчной, и с заглавной буквы.
+        condition = Q()
+        for word in value.lower().split():
+            word_condition = Q()
+            for variant in {word, word.capitalize()}:
+                word_condition |= (Q(name__icontains=variant)
+                                   | Q(text__icontains=variant))
+            condition &= word_condition
+        return (
+            queryset
+            .filter(condition)
+            .annotate(search_rank=Case(
+                When(name__icontains=value, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+            .order_by('-search_rank', '-created_at')
+        )
+
+
+    def filter_have(self, queryset, name, value):
+        # Отбор и порядок - в filter_queryset, после остальных фильтров
+        return queryset
+
+    def filter_queryset(self, queryset):
+        """
+        ?have=: рецепты, покрытые переданными ингредиентами не меньше чем
+        на min_coverage (по умолчанию полностью), лучше покрытые первыми.
+        Отбор и порядок берутся из индекса, БД только пересекает отбор
+        с остальными фильтрами и загружает страницу по id.
+        """
+        queryset = super().filter_queryset(queryset)
+        value = self.form.cleaned_data.get('have')
+        if not value:
+            return queryset
+        ingredient_ids = [int(pk) for pk in value.split(',')
+                          if pk.strip().isdigit()]
+        min_coverage = self.form.cleaned_data.get('min_coverage')
+        if min_coverage is None:
+            min_coverage = recipe_index.DEFAULT_MIN_COVERAGE
+        rows = recipe_index.get_index().coverage(
+            ingredient_ids, float(min_coverage), limit=None
+        )
+        return recipe_index.RankedRecipes(
+            queryset, [recipe_id for recipe_id, _, _ in rows]
+        )
+
+    def filter_min_coverage(self, queryset, name, value):
+        # Используется в filter_queryset
+        return queryset
+
+
 class IngredientFilter(FilterSet):
     name = CharFilter(field_name='name', lookup_expr='istartswith')
 
@@ -0,0 +1,22 @@
+"""Эндпоинт метрик для Prometheus"""
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from api.services import cache_metrics
+from api.services.cache_manager import get_cache_stats
+
+
+@require_GET
+def metrics(request):
+    """
+    Метрики в текстовом формате Prometheus.
+
+    Не проксируется nginx наружу - собирается Prometheus внутри кластера.
+    """
+    registry = cache_metrics.get_registry(get_cache_stats)
+    if registry is None:
+        return HttpResponse('prometheus_client не установлен', status=503)
+
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
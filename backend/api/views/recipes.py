@@ -1,20 +1,43 @@
 from rest_framework import viewsets
 from recipes.models import Ingredient
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import (IsAuthenticated,
+                                        IsAuthenticatedOrReadOnly)
+from rest_framework.parsers import JSONParser, MultiPartParser
+from api.parsers import ImageUploadParser, NDJSONParser
 from api.serializers.recipes import (IngredientSerializer,
                                      RecipeListSerializer,
                                      RecipeCreateSerializer)
-from recipes.models import Recipe
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import CustomUser
+from django.db.models import Prefetch, prefetch_related_objects
 from api.views.shopping_cart import ShoppingCartMixin
 from api.views.favorite import FavoriteMixin
 from django_filters.rest_framework import DjangoFilterBackend
 from api.views.filters import RecipeFilter, IngredientFilter
 from rest_framework.response import Response
 from rest_framework import status
-from api.pagination import LimitPageNumberPagination
+from api.pagination import RecipeFeedPagination
 from rest_framework.decorators import action
 from api.permissions import IsAuthorOrReadOnly
 from api.services.cache_manager import cache_queryset, CacheInvalidationMixin, CacheTTL
+from api.services.user_flags import overlay_recipe_flags
+from api.services import (counters, images, ingredient_index,
+                          recipe_import, recipe_index, shopping_list,
+                          uploads)
+from django.db import transaction
+
+
+def ingredient_amounts_prefetch():
+    return Prefetch(
+        'ingredient_amounts',
+        queryset=IngredientInRecipe.objects.select_related('ingredient'),
+    )
+
+
+def is_personal_recipe_list(request):
+    """Фильтры по избранному и корзине делают выборку персональной"""
+    return any(param in request.GET
+               for param in ('is_favorited', 'is_in_shopping_cart'))
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -24,41 +47,97 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
     
-    @cache_queryset("ingredients:list", ttl=CacheTTL.DAY)
     def list(self, request, *args, **kwargs):
-        """Список ингредиентов с кэшированием (редко меняются)"""
-        return super().list(request, *args, **kwargs)
-    
-    @cache_queryset("ingredients:detail", ttl=CacheTTL.DAY)
+        """
+        Автодополнение по ?name= из индекса в памяти (самые используемые
+        первыми, до ?limit=), без name - весь каталог. БД не трогает.
+        """
+        if request.query_params.get('name'):
+            return self._search(request, *args, **kwargs)
+        return self._catalog(request, *args, **kwargs)
+
+    @cache_queryset("ingredients:list", ttl=CacheTTL.DAY,
+                    namespaces=["ingredients"], per_user=False, local=True,
+                    conditional=True)
+    def _catalog(self, request, *args, **kwargs):
+        return Response(ingredient_index.get_index().all())
+
+    # Порядок зависит от популярности, а она в индексе обновляется
+    # раз в INDEX_TTL - дольше ответ хранить нельзя
+    @cache_queryset("ingredients:search", ttl=ingredient_index.INDEX_TTL,
+                    namespaces=["ingredients"], per_user=False, local=True,
+                    conditional=True)
+    def _search(self, request, *args, **kwargs):
+        limit = request.query_params.get('limit', '')
+        limit = (int(limit) if limit.isdigit()
+                 else ingredient_index.SEARCH_LIMIT)
+        return Response(ingredient_index.get_index().search(
+            request.query_params['name'], limit
+        ))
+
+    @cache_queryset("ingredients:detail", ttl=CacheTTL.DAY,
+                    namespaces=["ingredients"], per_user=False, local=True,
+                    conditional=True)
     def retrieve(self, request, *args, **kwargs):
         """Детали ингредиента с кэшированием"""
         return super().retrieve(request, *args, **kwargs)
 
 
 class RecipeViewSet(CacheInvalidationMixin, viewsets.ModelViewSet, ShoppingCartMixin, FavoriteMixin):
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipeFeedPagination
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly & IsAuthorOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     
-    # Паттерны для инвалидации кэша при изменениях
-    cache_key_patterns = [
-        "recipes:list:*",
-        "recipes:detail:*"
-    ]
+    # Пространства имён для инвалидации кэша при изменениях
+    # (создание, правка, удаление и импорт меняют и индекс ?have=)
+    cache_namespaces = ["recipes", recipe_index.INDEX_NAMESPACE]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            # Автор и ингредиенты страницы - фиксированным числом запросов
+            queryset = (
+                queryset
+                .select_related('author')
+                .prefetch_related(ingredient_amounts_prefetch())
+                .defer('search_vector')
+            )
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return RecipeListSerializer
         return RecipeCreateSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ['list', 'retrieve']:
+            # Ответ общий для всех пользователей: персональные флаги
+            # накладываются после кэша (overlay_recipe_flags).
+            context.update(favorited_ids=set(),
+                           shopping_cart_ids=set(),
+                           subscribed_ids=set())
+        if self.action == 'list':
+            context['image_variant'] = 'card'
+        return context
     
-    @cache_queryset("recipes:list", ttl=CacheTTL.FIVE_MINUTES)
+    @cache_queryset("recipes:list", ttl=CacheTTL.FIVE_MINUTES,
+                    namespaces=["recipes"],
+                    per_user=is_personal_recipe_list,
+                    local=True,
+                    personalize=overlay_recipe_flags,
+                    conditional=True)
     def list(self, request, *args, **kwargs):
         """Список рецептов с кэшированием"""
         return super().list(request, *args, **kwargs)
     
-    @cache_queryset("recipes:detail", ttl=CacheTTL.TEN_MINUTES)
+    @cache_queryset("recipes:detail", ttl=CacheTTL.TEN_MINUTES,
+                    namespaces=["recipes", "recipe:{pk}"],
+                    per_user=False,
+                    personalize=overlay_recipe_flags,
+                    conditional=True)
     def retrieve(self, request, *args, **kwargs):
         """Детали рецепта с кэшированием"""
         return super().retrieve(request, *args, **kwargs)
@@ -66,10 +145,22 @@ class RecipeViewSet(CacheInvalidationMixin, viewsets.ModelViewSet, ShoppingCartM
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Корзины с рецептом удалятся каскадом - убрать его из списков покупок
+        user_ids = shopping_list.cart_user_ids(instance.id)
+        ingredient_ids = list(
+            instance.ingredient_amounts.values_list('ingredient_id', flat=True)
+        )
+        super().perform_destroy(instance)
+        shopping_list.rebuild(user_ids, ingredient_ids)
+        counters.increment(CustomUser, instance.author_id, recipes_count=-1)
+
     def create(self, request, *args, **kwargs):
         serializer = RecipeCreateSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         recipe = serializer.save(author=request.user)
+        prefetch_related_objects([recipe], ingredient_amounts_prefetch())
         output_serializer = RecipeListSerializer(recipe, context={'request': request})
     
         self.invalidate_cache()
@@ -86,11 +177,67 @@ class RecipeViewSet(CacheInvalidationMixin, viewsets.ModelViewSet, ShoppingCartM
                                             context={'request': request})
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        prefetch_related_objects([serializer.instance],
+                                 ingredient_amounts_prefetch())
 
         output_serializer = RecipeListSerializer(serializer.instance,
                                                  context={'request': request})
         return Response(output_serializer.data)
 
+    @action(
+        detail=True,
+        methods=['put'],
+        url_path='image',
+        parser_classes=[MultiPartParser, ImageUploadParser],
+    )
+    def image(self, request, pk=None):
+        """
+        Заменить изображение рецепта файлом: multipart (поле image)
+        или бинарным телом с Content-Type: image/*. Тело читается
+        потоком во временный файл, без base64.
+        """
+        recipe = self.get_object()
+        uploads.prepare(request)
+        uploads.attach(recipe, 'image', uploads.get_upload(request, 'image'))
+        images.schedule_variants(recipe, 'image',
+                                 ['recipes', f'recipe:{recipe.pk}'])
+        self.invalidate_cache(['recipes'])
+        return Response({
+            'image': request.build_absolute_uri(recipe.image.url),
+        })
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        permission_classes=[IsAuthenticated],
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def import_recipes(self, request):
+        """
+        Массовое создание рецептов текущего пользователя: JSON-массив
+        или NDJSON (рецепт на строку, читается потоком). Отвечает
+        результатом по каждому элементу; кэш сбрасывается после каждой
+        сохранённой пачки.
+        """
+        length = request.META.get('CONTENT_LENGTH') or ''
+        if length.isdigit() and int(length) > recipe_import.MAX_BYTES:
+            return Response(
+                {'errors': f'Тело больше '
+                           f'{recipe_import.MAX_BYTES // (1024 * 1024)} МБ.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        items = request.data
+        if isinstance(items, (dict, str, int, float)) or items is None:
+            return Response(
+                {'errors': 'Ожидается массив рецептов или NDJSON.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        report = recipe_import.import_recipes(
+            request.user, items, after_chunk=self.invalidate_cache
+        )
+        return Response(report)
+
     @action(
         detail=True,
         methods=['get'],
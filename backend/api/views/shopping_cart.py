@@ -4,9 +4,13 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from recipes.models import Recipe, ShoppingCart
 from api.serializers.shopping_cart import ShoppingCartSerializer
-from django.http import HttpResponse
-from recipes.models import IngredientInRecipe
-from api.services.cache_manager import get_cache_manager, CacheTTL
+from api.serializers.recipes import RecipeIdListSerializer
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from api.renderers import CSVRenderer, PlainTextRenderer
+from api.services.cache_manager import invalidate_user_cache
+from api.services import counters, shopping_list, toggles
+from django.db import transaction
 
 
 class ShoppingCartMixin:
@@ -15,90 +19,100 @@ class ShoppingCartMixin:
             permission_classes=[permissions.IsAuthenticated])
     def shopping_cart(self, request, pk=None):
         user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
 
         if request.method == 'POST':
-            if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
+            with transaction.atomic():
+                added = self._add_to_cart(user, [pk])
+            recipe = get_object_or_404(Recipe.objects.only(
+                'id', 'name', 'image', 'image_variants', 'cooking_time'
+            ), pk=pk)
+            if not added:
                 return Response({'errors': 'Рецепт уже в корзине.'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            ShoppingCart.objects.create(user=user, recipe=recipe)
             serializer = ShoppingCartSerializer(recipe)
-            
-            try:
-                cache = get_cache_manager()
-                if cache:
-                    cache.delete_pattern(f"recipes:list:*user_id*{user.id}*")
-                    cache.delete_pattern(f"shopping_cart:*user_id*{user.id}*")
-            except Exception:
-                pass
-            
+
+            invalidate_user_cache(user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        cart_item = ShoppingCart.objects.filter(user=user, recipe=recipe).first()
-        if not cart_item:
+        with transaction.atomic():
+            removed = self._remove_from_cart(user, [pk])
+        if not removed:
+            get_object_or_404(Recipe, pk=pk)
             return Response({'errors': 'Рецепта не было в корзине.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        cart_item.delete()
-        
-        try:
-            cache = get_cache_manager()
-            if cache:
-                cache.delete_pattern(f"recipes:list:*user_id*{user.id}*")
-                cache.delete_pattern(f"shopping_cart:*user_id*{user.id}*")
-        except Exception:
-            pass
-        
+
+        invalidate_user_cache(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        """
+        Добавить или убрать сразу несколько рецептов (например, меню
+        на неделю): {"recipes": [id]}. В skipped - несуществующие и уже
+        (не) бывшие в корзине.
+        """
+        serializer = RecipeIdListSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        user = request.user
+
+        with transaction.atomic():
+            if request.method == 'POST':
+                key = 'added'
+                changed = self._add_to_cart(user, recipe_ids)
+            else:
+                key = 'removed'
+                changed = self._remove_from_cart(user, recipe_ids)
+
+        if changed:
+            invalidate_user_cache(user.id)
+        return Response({
+            key: changed,
+            'skipped': sorted(set(recipe_ids) - set(changed)),
+        })
+
+    @staticmethod
+    def _add_to_cart(user, recipe_ids):
+        added = toggles.add(ShoppingCart, 'recipe', user.id, recipe_ids)
+        if added:
+            # Сначала строки рецептов, потом пользователя - в том же
+            # порядке, что и правка рецепта (save, затем rebuild списков)
+            counters.increment_many(Recipe, added, in_carts_count=1)
+            shopping_list.add_recipes(user.id, added)
+        return added
+
+    @staticmethod
+    def _remove_from_cart(user, recipe_ids):
+        removed = toggles.remove(ShoppingCart, 'recipe', user.id, recipe_ids)
+        if removed:
+            counters.increment_many(Recipe, removed, in_carts_count=-1)
+            shopping_list.remove_recipes(user.id, removed)
+        return removed
+
     @action(
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart',
-        permission_classes=[permissions.IsAuthenticated]
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer],
     )
     def download_shopping_cart(self, request):
-        """Скачать список покупок с кэшированием"""
-        user = request.user
-        
-        cache = get_cache_manager()
-        cache_key = f"shopping_cart:download:user_id:{user.id}"
-        
-        if cache:
-            try:
-                cached_content = cache.get(cache_key)
-                if cached_content is not None:
-                    print(f"✓ Список покупок из кэша: user_id={user.id}")
-                    response = HttpResponse(cached_content, content_type='text/plain')
-                    response['Content-Disposition'] = 'attachment; filename=shopping_list.txt'
-                    return response
-            except Exception as e:
-                print(f"Ошибка получения из кэша: {e}")
-        
-        recipes = Recipe.objects.filter(in_shopping_carts__user=user)
-        ingredients = {}
-
-        for recipe in recipes:
-            for item in IngredientInRecipe.objects.filter(recipe=recipe):
-                name = item.ingredient.name
-                unit = item.ingredient.measurement_unit
-                amount = item.amount
-
-                key = (name, unit)
-                ingredients[key] = ingredients.get(key, 0) + amount
-
-        lines = ['Список покупок:\n']
-        for (name, unit), amount in ingredients.items():
-            lines.append(f'• {name} — {amount} {unit}')
+        """
+        Скачать список покупок (?format=txt|csv|json).
 
-        content = '\n'.join(lines)
-        
-        if cache:
-            try:
-                cache.set(cache_key, content, CacheTTL.FIVE_MINUTES)
-                print(f"✓ Список покупок сохранен в кэш: user_id={user.id}")
-            except Exception as e:
-                print(f"Ошибка сохранения в кэш: {e}")
-        
-        response = HttpResponse(content, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename=shopping_list.txt'
+        Суммы ингредиентов уже посчитаны (ShoppingListItem) и отдаются
+        потоком, не собирая файл в памяти.
+        """
+        fmt = request.accepted_renderer.format
+        rows = shopping_list.get_shopping_list(request.user)
+        response = StreamingHttpResponse(
+            shopping_list.stream_shopping_list(rows, fmt),
+            content_type=shopping_list.FORMATS[fmt],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping_list.{fmt}'
+        )
         return response
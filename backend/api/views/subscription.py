@@ -3,14 +3,23 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import (
+    BooleanField, F, Prefetch, Value, Window,
+)
+from django.db.models.functions import RowNumber
 
 from users.models.subscription import Subscription
 from users.models.user import CustomUser
+from recipes.models import Recipe
 from api.serializers.subscription import (
-    SubscriptionCreateSerializer,
-    AuthorWithRecipesSerializer
+    AuthorWithRecipesSerializer,
+    get_recipes_limit,
+)
+from api.services.cache_manager import (
+    cache_queryset, invalidate_user_cache, CacheTTL,
 )
-from api.services.cache_manager import cache_queryset, get_cache_manager, CacheTTL
+from api.services import counters, toggles
 
 
 class SubscriptionMixin:
@@ -19,55 +28,70 @@ class SubscriptionMixin:
             permission_classes=[IsAuthenticated])
     def subscribe(self, request, id=None):
         user = request.user
-        author = get_object_or_404(CustomUser, id=id)
 
         if request.method == 'POST':
-            serializer = SubscriptionCreateSerializer(
-                data={'user': user.id, 'author': author.id}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                added = toggles.add(Subscription, 'author', user.id, [id],
+                                    exclude_self=True)
+                counters.increment_many(CustomUser, added, followers_count=1)
+            author = get_object_or_404(CustomUser, id=id)
+            if not added:
+                message = ('Нельзя подписаться на самого себя.'
+                           if author.id == user.id
+                           else 'Вы уже подписаны на этого пользователя.')
+                return Response({'non_field_errors': [message]},
+                                status=status.HTTP_400_BAD_REQUEST)
             response_serializer = AuthorWithRecipesSerializer(author,
                                                               context={'request': request})
-            
-            try:
-                cache = get_cache_manager()
-                if cache:
-                    cache.delete_pattern(f"subscriptions:*user_id*{user.id}*")
-                    cache.delete_pattern(f"users:list:*")
-                    cache.delete_pattern(f"users:detail:*")
-            except Exception:
-                pass
-            
+
+            invalidate_user_cache(user.id)
             return Response(response_serializer.data,
                             status=status.HTTP_201_CREATED)
 
-        subscription = Subscription.objects.filter(user=user, author=author).first()
-        if not subscription:
+        with transaction.atomic():
+            removed = toggles.remove(Subscription, 'author', user.id, [id])
+            counters.increment_many(CustomUser, removed, followers_count=-1)
+        if not removed:
+            get_object_or_404(CustomUser, id=id)
             return Response({'error': 'Вы не подписаны на этого пользователя.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        subscription.delete()
-        
-        try:
-            cache = get_cache_manager()
-            if cache:
-                cache.delete_pattern(f"subscriptions:*user_id*{user.id}*")
-                cache.delete_pattern(f"users:list:*")
-                cache.delete_pattern(f"users:detail:*")
-        except Exception:
-            pass
-        
+
+        invalidate_user_cache(user.id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False,
             methods=['get'],
             permission_classes=[IsAuthenticated])
-    @cache_queryset("subscriptions:list", ttl=CacheTTL.FIVE_MINUTES)
+    @cache_queryset("subscriptions:list", ttl=CacheTTL.FIVE_MINUTES,
+                    namespaces=["users"])
     def subscriptions(self, request):
         """Список подписок пользователя с кэшированием"""
-        queryset = CustomUser.objects.filter(subscribers__user=request.user)
+        queryset = (
+            CustomUser.objects
+            .filter(subscribers__user=request.user)
+            # Все авторы выборки - подписки пользователя
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .prefetch_related(Prefetch(
+                'recipes',
+                queryset=self._limited_recipes(get_recipes_limit(request)),
+                to_attr='limited_recipes',
+            ))
+        )
         page = self.paginate_queryset(queryset)
         serializer = AuthorWithRecipesSerializer(page,
                                                  many=True,
                                                  context={'request': request})
         return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def _limited_recipes(limit):
+        """Не больше limit последних рецептов каждого автора"""
+        recipes = Recipe.objects.only('id', 'name', 'image', 'image_variants',
+                                      'cooking_time', 'author_id')
+        if limit is None:
+            return recipes
+        return recipes.annotate(row_number=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=F('created_at').desc(),
+        )).filter(row_number__lte=limit)
@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from users.models.user import CustomUser
+from users.models.subscription import Subscription
+from django.db.models import Exists, OuterRef
 from api.views.subscription import SubscriptionMixin
 from api.serializers.users import CustomUserSerializer
 from api.serializers.users import AvatarSerializer
@@ -13,6 +15,9 @@ from rest_framework.permissions import AllowAny
 import secrets, urllib.parse, requests
 from django.shortcuts import redirect
 from api.services.cache_manager import cache_queryset, get_cache_manager, CacheTTL
+from api.services import images, uploads
+from api.parsers import ImageUploadParser
+from rest_framework.parsers import JSONParser, MultiPartParser
 
 GITHUB_AUTH_URL  = "https://github.com/login/oauth/authorize"  # :contentReference[oaicite:0]{index=0}
 GITHUB_TOKEN_URL = "https://github.com/login/oauth/access_token"  # :contentReference[oaicite:1]{index=1}
@@ -23,13 +28,24 @@ class CustomUserViewSet(UserViewSet, SubscriptionMixin):
     lookup_field = 'id'
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(user=user, author=OuterRef('pk'))
+            ))
+        return queryset
     
-    @cache_queryset("users:list", ttl=CacheTTL.TEN_MINUTES)
+    @cache_queryset("users:list", ttl=CacheTTL.TEN_MINUTES,
+                    namespaces=["users"], conditional=True)
     def list(self, request, *args, **kwargs):
         """Список пользователей с кэшированием"""
         return super().list(request, *args, **kwargs)
     
-    @cache_queryset("users:detail", ttl=CacheTTL.TEN_MINUTES)
+    @cache_queryset("users:detail", ttl=CacheTTL.TEN_MINUTES,
+                    namespaces=["users"], conditional=True)
     def retrieve(self, request, *args, **kwargs):
         """Детали пользователя с кэшированием"""
         return super().retrieve(request, *args, **kwargs)
@@ -40,36 +56,52 @@ class CustomUserViewSet(UserViewSet, SubscriptionMixin):
         permission_classes=[IsAuthenticated]
     )
     def me(self, request, *args, **kwargs):
-        return super().me(request, *args, **kwargs)
+        response = super().me(request, *args, **kwargs)
+        if request.method in ('PUT', 'PATCH'):
+            self._invalidate_profile(request.user)
+        return response
 
-    @action(detail=False, methods=['put'], url_path='me/avatar', permission_classes=[IsAuthenticated])
-    def set_avatar(self, request):
-        user = request.user
-        serializer = AvatarSerializer(user, data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        
+    @staticmethod
+    def _invalidate_profile(user):
+        """Профиль встроен в списки пользователей, рецептов и подписок"""
         try:
             cache = get_cache_manager()
             if cache:
-                cache.delete_pattern(f"users:list:*")
-                cache.delete_pattern(f"users:detail:*")
+                cache.bump_generations("users", "recipes",
+                                       f"user:{user.id}")
         except Exception:
             pass
+
+    @action(detail=False, methods=['put'], url_path='me/avatar', permission_classes=[IsAuthenticated],
+            parser_classes=[JSONParser, MultiPartParser, ImageUploadParser])
+    def set_avatar(self, request):
+        """
+        Аватар base64 в JSON или файлом: multipart (поле avatar)
+        либо бинарным телом с Content-Type: image/*.
+        """
+        user = request.user
+        if uploads.is_file_upload(request):
+            # Потоком во временный файл, без base64 и копий в памяти
+            uploads.prepare(request)
+            uploads.attach(user, 'avatar',
+                           uploads.get_upload(request, 'avatar'))
+            images.schedule_variants(user, 'avatar', ['users', 'recipes'])
+            serializer = AvatarSerializer(user)
+        else:
+            serializer = AvatarSerializer(user, data=request.data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        
+        self._invalidate_profile(user)
         
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @set_avatar.mapping.delete
     def delete_avatar(self, request):
         user = request.user
+        images.discard_variants(user, 'avatar')
         user.avatar.delete(save=True)
         
-        try:
-            cache = get_cache_manager()
-            if cache:
-                cache.delete_pattern(f"users:list:*")
-                cache.delete_pattern(f"users:detail:*")
-        except Exception:
-            pass
+        self._invalidate_profile(user)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
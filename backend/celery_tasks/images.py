@@ -0,0 +1,48 @@
+"""Фоновая обработка загруженных изображений"""
+import logging
+from typing import Dict, List
+
+from celery import shared_task
+from PIL import UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='celery_tasks.images.make_image_variants',
+             ignore_result=True,
+             autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def make_image_variants(model_label: str, pk: int, field: str,
+                        namespaces: List[str]) -> Dict:
+    """
+    Построить WebP-варианты изображения и сбросить кэш ответов с ним
+
+    Args:
+        model_label: Модель объекта ('recipes.recipe', 'users.customuser')
+        pk: Id объекта
+        field: Поле изображения ('image', 'avatar')
+        namespaces: Пространства имён кэша для инвалидации
+
+    Returns:
+        dict: Статус и имена файлов вариантов
+    """
+    from django.apps import apps
+
+    from api.services import images
+    from api.services.cache_manager import get_cache_manager
+
+    model = apps.get_model(model_label)
+    try:
+        variants = images.make_variants(model, pk, field)
+    except UnidentifiedImageError as e:
+        # Тоже OSError, но повтор не поможет - отдаётся оригинал
+        logger.warning('Не удалось построить варианты %s #%s: %s',
+                       model_label, pk, e)
+        return {'status': 'failed', 'variants': {}}
+    if variants and namespaces:
+        cache = get_cache_manager()
+        if cache:
+            cache.bump_generations(*namespaces)
+    return {
+        'status': 'success' if variants else 'skipped',
+        'variants': variants,
+    }
@@ -0,0 +1,21 @@
+"""Периодические задачи обслуживания данных"""
+from typing import Dict
+
+from celery import shared_task
+
+
+@shared_task(name='celery_tasks.maintenance.check_shopping_lists')
+def check_shopping_lists() -> Dict:
+    """
+    Сверить списки покупок с корзинами и пересобрать разошедшиеся
+
+    Returns:
+        dict: Статус и id пользователей, чьи списки были исправлены
+    """
+    from api.services import shopping_list
+
+    drifted = shopping_list.check()
+    return {
+        'status': 'success',
+        'drifted_users': drifted,
+    }
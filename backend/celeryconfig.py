@@ -30,9 +30,26 @@ task_reject_on_worker_lost = True
 # Настройки результатов
 result_expires = 3600  # 1 час
 
+# Модули задач: autodiscover_tasks ищет только celery_tasks.tasks
+imports = (
+    'celery_tasks.external_api',
+    'celery_tasks.maintenance',
+    'celery_tasks.images',
+)
+
 # Имена задач
 task_routes = {
     'celery_tasks.external_api.*': {'queue': 'external_api'},
+    'celery_tasks.maintenance.*': {'queue': 'maintenance'},
+    'celery_tasks.images.*': {'queue': 'images'},
+}
+
+# Периодические задачи (нужен процесс celery beat)
+beat_schedule = {
+    'check-shopping-lists': {
+        'task': 'celery_tasks.maintenance.check_shopping_lists',
+        'schedule': int(os.getenv('SHOPPING_LIST_CHECK_INTERVAL', 6 * 3600)),
+    },
 }
 
 # Worker настройки
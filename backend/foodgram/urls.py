@@ -21,9 +21,12 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from api.views.metrics import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),  # JSON-схема OpenAPI
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),  # Swagger UI
     path('api/', include('api.urls')),  # все API роуты в отдельном модуле
+    path('metrics', metrics, name='metrics'),  # Prometheus
 ]
@@ -0,0 +1,27 @@
+"""Настройки gunicorn для backend"""
+import os
+import shutil
+
+# Счётчики Prometheus общие для всех worker-ов gunicorn. Задаётся
+# только здесь: celery и consumer из того же образа пишут метрики
+# в память процесса, а не в файлы, которые никто не чистит.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+timeout = 120
+
+
+def on_starting(server):
+    """Очистить файлы метрик Prometheus от предыдущего запуска"""
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Убрать gauge-файлы завершившегося worker-а"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
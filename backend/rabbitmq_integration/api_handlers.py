@@ -7,9 +7,9 @@ from datetime import datetime
 import os
 import hashlib
 
-# Добавить путь к api/services для импорта cache_manager
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../api/services'))
-from cache_manager import get_cache_manager, CacheTTL
+# Добавить корень backend для импорта api.services.cache_manager
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from api.services.cache_manager import get_cache_manager, CacheTTL
 
 
 class TheMealDBHandler:
@@ -1,7 +1,6 @@
 from django.contrib import admin
 from .models import Recipe, Ingredient, IngredientInRecipe
 from users.models import CustomUser
-from django.db.models import Count
 
 
 class IngredientInRecipeInline(admin.TabularInline):
@@ -11,19 +10,11 @@ class IngredientInRecipeInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'cooking_time', 'favorites_count')
+    list_display = ('id', 'name', 'author', 'cooking_time',
+                    'favorites_count', 'in_carts_count')
     inlines = [IngredientInRecipeInline]
     search_fields = ['name', 'author__username']
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(favorites_total=Count('favorited_by'))
-
-    def favorites_count(self, obj):
-        return obj.favorites_total
-
-    favorites_count.short_description = 'В избранном'
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -34,7 +25,8 @@ class IngredientAdmin(admin.ModelAdmin):
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
     model = CustomUser
-    list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff')
+    list_display = ('email', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count', 'is_staff')
     list_filter = ('is_staff', 'is_superuser', 'is_active')
     ordering = ('email',)
     search_fields = ('email', 'first_name')
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.3 on 2026-10-18 10:24
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('pg_catalog.russian', coalesce({row}name, '')),
+              'A')
+    || setweight(to_tsvector('pg_catalog.russian', coalesce({row}text, '')),
+                 'B')
+"""
+
+CREATE_SQL = [
+    f"""
+    CREATE FUNCTION recipes_recipe_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW.')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector_update()
+    """,
+    f"UPDATE recipes_recipe SET search_vector = {SEARCH_VECTOR_SQL.format(row='')}",
+    """
+    CREATE INDEX recipe_search_vector_gin ON recipes_recipe
+    USING gin (search_vector)
+    """,
+]
+
+DROP_SQL = [
+    "DROP INDEX IF EXISTS recipe_search_vector_gin",
+    "DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger "
+    "ON recipes_recipe",
+    "DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()",
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        # SQLite: поле остаётся пустым, поиск идёт через icontains
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(_run_on_postgres(CREATE_SQL),
+                             _run_on_postgres(DROP_SQL)),
+    ]
@@ -1,9 +1,10 @@
 from recipes.models.recipe import Recipe, Ingredient, IngredientInRecipe
-from recipes.models.shopping_cart import ShoppingCart
+from recipes.models.shopping_cart import ShoppingCart, ShoppingListItem
 from recipes.models.favorite import Favorite
 
 __all__ = ['Recipe',
            'Ingredient',
            'IngredientInRecipe',
            'ShoppingCart',
+           'ShoppingListItem',
            'Favorite']
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 
@@ -30,13 +31,49 @@ class Recipe(models.Model):
         related_name='recipes'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Заполняется триггером Postgres из name и text (миграция 0005),
+    # там же GIN-индекс. В SQLite всегда NULL.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Меняются только F()-обновлениями (api.services.counters)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В корзинах', default=0, editable=False
+    )
+
+    # Имена файлов WebP-вариантов image (api.services.images)
+    image_variants = models.JSONField(
+        'Варианты изображения', default=dict, blank=True, editable=False
+    )
+
+    COUNTER_FIELDS = ('favorites_count', 'in_carts_count')
+    # Пишутся фоновыми задачами отдельным UPDATE, save() их не трогает
+    BACKGROUND_FIELDS = COUNTER_FIELDS + ('image_variants',)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset-пагинация ленты (RecipeFeedPagination)
+            models.Index(fields=['-created_at', '-id'],
+                         name='recipe_created_id_idx'),
+            models.Index(fields=['author', '-created_at', '-id'],
+                         name='recipe_author_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Не затирать значением, прочитанным до чужих фоновых обновлений
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.BACKGROUND_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
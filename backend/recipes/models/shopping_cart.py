@@ -1,6 +1,6 @@
 from django.db import models
 from django.conf import settings
-from recipes.models import Recipe
+from recipes.models import Ingredient, Recipe
 
 
 class ShoppingCart(models.Model):
@@ -22,3 +22,31 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в корзину'
+
+
+class ShoppingListItem(models.Model):
+    """
+    Сумма ингредиента по всем рецептам корзины пользователя.
+
+    Поддерживается приращениями при изменении корзины и рецептов
+    (api.services.shopping_list), расхождения чинит check_shopping_lists.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE
+    )
+    amount = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} — {self.amount}'
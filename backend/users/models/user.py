@@ -26,6 +26,29 @@ class CustomUser(AbstractUser):
         blank=True,
         null=True
     )
+    # Меняются только F()-обновлениями (api.services.counters)
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
+
+    # Имена файлов WebP-вариантов avatar (api.services.images)
+    avatar_variants = models.JSONField(
+        verbose_name='Варианты аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+
+    COUNTER_FIELDS = ('recipes_count', 'followers_count')
+    # Пишутся фоновыми задачами отдельным UPDATE, save() их не трогает
+    BACKGROUND_FIELDS = COUNTER_FIELDS + ('avatar_variants',)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -35,3 +58,13 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return f'{self.username} ({self.email})'
+
+    def save(self, *args, **kwargs):
+        # Не затирать значением, прочитанным до чужих фоновых обновлений
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.BACKGROUND_FIELDS
+            ]
+        super().save(*args, **kwargs)